@@ -0,0 +1,62 @@
+"""
+Per-message cost of signal extraction (src.matcher.scan: intent keywords,
+period, limit, tx id in one pass) and of full rules classification plus
+post-processing, over the phrasings exercised by tests/run_tests_v2.sh.
+Run from the repo root:
+
+    python -m benchmarks.bench_classify [iterations]
+"""
+from __future__ import annotations
+
+import contextlib
+import io
+import re
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+from src.matcher import scan
+from src.query_spec_builder import _compile_rules_scored, _postprocess
+
+_TEST_SCRIPT = Path(__file__).resolve().parents[1] / "tests" / "run_tests_v2.sh"
+
+
+def load_phrasings() -> List[str]:
+    # test_query "<name>" "<message>" "<intent>" ...
+    return re.findall(r'^\s*test_query\s+"[^"]*"\s+"([^"]*)"', _TEST_SCRIPT.read_text(), flags=re.M)
+
+
+def _us_per_message(fn, phrasings: List[str], iterations: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        for msg in phrasings:
+            fn(msg)
+    return (time.perf_counter() - t0) / (iterations * len(phrasings)) * 1e6
+
+
+def main(iterations: int) -> None:
+    phrasings = load_phrasings()
+    lowered = [p.lower() for p in phrasings]
+    uncached = _us_per_message(scan.__wrapped__, lowered, iterations)
+    cached = _us_per_message(scan, lowered, iterations)
+
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink):
+        t0 = time.perf_counter()
+        for _ in range(iterations):
+            for msg in phrasings:
+                spec, _ = _compile_rules_scored(msg, None)
+                _postprocess(spec, msg)
+                sink.seek(0)
+                sink.truncate()
+        elapsed = time.perf_counter() - t0
+    n = iterations * len(phrasings)
+    print(f"{len(phrasings)} phrasings x {iterations} iterations")
+    print(f"signal scan (uncached):  {uncached:.2f} us/message")
+    print(f"signal scan (cached):    {cached:.2f} us/message")
+    print(f"classify + post-process: {elapsed / n * 1e6:.1f} us/message (QuerySpec building and logging included)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000)
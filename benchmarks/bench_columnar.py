@@ -0,0 +1,64 @@
+"""
+Memory per transaction and YTD top-spending aggregation time: Pydantic
+objects vs the ColumnarTransactions view. Run from the repo root:
+
+    python -m benchmarks.bench_columnar [rows]
+"""
+from __future__ import annotations
+
+import sys
+import time
+import tracemalloc
+from datetime import date
+from typing import Dict, List
+
+from benchmarks.synth import make_raw_transactions
+from src.columnar import ColumnarTransactions
+from src.compute import handle_top_spending_ytd
+from src.mock_store import AccountIndex
+from src.schemas import QuerySpec, Transaction
+
+
+def _object_ytd(txs: List[Transaction], start: date) -> Dict[str, float]:
+    # The per-object loop handle_top_spending_ytd used before the columnar view
+    by_cat: Dict[str, float] = {}
+    for t in txs:
+        if t.direction == "debit" and not t.isPending and t.postedAt.date() >= start:
+            by_cat[t.merchant.category] = by_cat.get(t.merchant.category, 0.0) + t.amount
+    return by_cat
+
+
+def _best_ms(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1e3
+
+
+def main(n: int) -> None:
+    raw = make_raw_transactions(n)
+
+    tracemalloc.start()
+    txs = [Transaction.model_validate(r) for r in raw]
+    obj_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    index = AccountIndex(txs)
+    cols = index.columns
+    print(f"rows: {n:,}")
+    print(f"bytes/tx  objects: {obj_bytes / n:8.0f}   columnar: {cols.nbytes() / n:6.0f}")
+
+    start = date(date.today().year, 1, 1)
+    end = date.today()
+    q = QuerySpec(intent="top_spending_ytd", time_range=None, params={"top_k": 5})
+    obj_ms = _best_ms(lambda: _object_ytd(index.transactions, start))
+    col_ms = _best_ms(lambda: handle_top_spending_ytd(q, index.columns_range(start, end)))
+    build_ms = _best_ms(lambda: ColumnarTransactions.from_transactions(index.transactions), repeat=1)
+    print(f"YTD top spending  objects: {obj_ms:8.2f} ms   columnar: {col_ms:6.2f} ms")
+    print(f"one-off columnar build: {build_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
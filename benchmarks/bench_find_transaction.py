@@ -0,0 +1,51 @@
+"""
+Transaction-by-id lookup latency: linear scan (old find_transaction) vs the
+AccountIndex id map. Run from the repo root:
+
+    python -m benchmarks.bench_find_transaction [max_rows]
+"""
+from __future__ import annotations
+
+import random
+import sys
+import time
+from typing import List, Optional
+
+from benchmarks.synth import make_transactions
+from src.mock_store import AccountIndex
+from src.schemas import Transaction
+
+SIZES = [70, 1_000, 10_000, 100_000, 1_000_000]
+LOOKUPS = 2_000
+
+
+def _linear_find(txs: List[Transaction], tx_id: str) -> Optional[Transaction]:
+    for tx in txs:
+        if tx.id == tx_id:
+            return tx
+    return None
+
+
+def _per_lookup_us(fn, ids: List[str]) -> float:
+    t0 = time.perf_counter()
+    for tx_id in ids:
+        fn(tx_id)
+    return (time.perf_counter() - t0) / len(ids) * 1e6
+
+
+def main(max_rows: int) -> None:
+    print(f"{'rows':>10} {'linear (us)':>14} {'indexed (us)':>14}")
+    for n in [s for s in SIZES if s <= max_rows]:
+        txs = make_transactions(n)
+        index = AccountIndex(txs)
+        rng = random.Random(n)
+        ids = [txs[rng.randrange(n)].id for _ in range(LOOKUPS)]
+        # The scan is O(n); sample fewer lookups on big accounts to keep runtime sane
+        scan_ids = ids[: max(10, LOOKUPS * 1_000 // n)]
+        linear = _per_lookup_us(lambda i: _linear_find(index.transactions, i), scan_ids)
+        indexed = _per_lookup_us(index.get, ids)
+        print(f"{n:>10,} {linear:>14.2f} {indexed:>14.3f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else SIZES[-1])
@@ -0,0 +1,90 @@
+"""
+Load test of LLM QuerySpec compilation against a local fake Ollama
+(benchmarks.fake_ollama) with and without micro-batching. Requests arrive
+as a Poisson stream of distinct messages (no single-flight coalescing) and
+go through llm.query_spec_call_llm: batcher -> limiter -> HTTP. Requests
+turned away by the LLM queue bounds are counted as rejected; req/s counts
+completed ones.
+Run from the repo root:
+
+    python -m benchmarks.bench_llm_batching [requests] [rate_per_s] [window_ms ...]
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import io
+import random
+import statistics
+import sys
+import time
+from typing import List, Tuple
+
+from benchmarks.fake_ollama import FakeOllama
+from src import llm
+from src.config import OLLAMA_NUM_PARALLEL
+from src.http_clients import clients
+from src.llm_gate import LLMOverloaded
+from src.prompts import QUERY_SPEC_SYSTEM_PROMPT
+
+
+async def _load(n: int, rate: float, seed: int) -> Tuple[List[float], int]:
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    rejected = 0
+
+    async def one(i: int) -> None:
+        nonlocal rejected
+        t0 = time.perf_counter()
+        try:
+            await llm.query_spec_call_llm(QUERY_SPEC_SYSTEM_PROMPT, f"list transactions for load test user {i}")
+        except LLMOverloaded:
+            rejected += 1
+            return
+        latencies.append(time.perf_counter() - t0)
+
+    tasks = []
+    for i in range(n):
+        tasks.append(asyncio.create_task(one(i)))
+        await asyncio.sleep(rng.expovariate(rate))
+    await asyncio.gather(*tasks)
+    return latencies, rejected
+
+
+async def _compare(fake: FakeOllama, n: int, rate: float, windows: List[float]) -> None:
+    # One event loop for every run: the LLM limiter's semaphore binds to the loop it first waits on
+    for window_ms in windows:
+        llm.configure_batching(window_ms)
+        fake.reset()
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            latencies, rejected = await _load(n, rate, seed=11)
+        elapsed = time.perf_counter() - t0
+        latencies.sort()
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        label = f"{window_ms:g} ms" if window_ms > 0 else "off"
+        print(f"{label:>8} {len(latencies) / elapsed:8.1f} {statistics.median(latencies) * 1e3:8.0f} {p95 * 1e3:8.0f} "
+              f"{rejected:9d} {len(fake.rounds):7d} {statistics.mean(fake.rounds):10.2f}")
+    await clients.aclose()
+
+
+def main(n: int, rate: float, windows: List[float]) -> None:
+    fake = FakeOllama(num_parallel=OLLAMA_NUM_PARALLEL).start()
+    llm.OLLAMA_URL = fake.url
+    print(f"{n} requests, Poisson arrivals at {rate:g}/s, fake Ollama: {fake.num_parallel} slots, "
+          f"round {fake.round_ms:g} ms + {fake.per_item_ms:g} ms/item")
+    print(f"{'window':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'rejected':>9} {'rounds':>7} {'avg round':>10}")
+    try:
+        asyncio.run(_compare(fake, n, rate, windows))
+    finally:
+        fake.stop()
+        llm.configure_batching(0)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(
+        int(args[0]) if args else 200,
+        float(args[1]) if len(args) > 1 else 20.0,
+        [float(a) for a in args[2:]] or [0.0, 10.0, 25.0],
+    )
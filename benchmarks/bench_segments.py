@@ -0,0 +1,124 @@
+"""
+Memory of W uvicorn-style worker processes serving the same account:
+STORE_BACKEND=memory (each worker holds its own Transaction objects) vs
+STORE_BACKEND=mmap (workers share the snapshot's pages). All workers stay
+alive while their /proc/<pid>/smaps_rollup is read, so PSS splits shared
+pages fairly and the PSS sum is the real footprint. Linux only. Run from
+the repo root:
+
+    python -m benchmarks.bench_segments [rows] [workers]     (default: 200000 4)
+"""
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks.synth import make_transactions
+from src import snapshot
+
+# One worker: load the account, serve a request mix, report, then wait so its siblings are measured alongside it
+_WORKER = """
+import sys, time
+from datetime import date, timedelta
+from pathlib import Path
+from src import mock_store
+
+mock_store._DATA_DIR = Path(sys.argv[1])
+today = date.today()
+
+def mix(tx_id):
+    mock_store.query_transactions_page("BENCH", today - timedelta(days=3 * 365), today, limit=50)
+    mock_store.spend_breakdown("BENCH", today - timedelta(days=365), today)
+    mock_store.recurring_window("BENCH", today - timedelta(days=180), today).detect()
+    mock_store.find_transaction("BENCH", tx_id)
+
+t0 = time.perf_counter()
+mix(sys.argv[2])
+cold = time.perf_counter() - t0
+t0 = time.perf_counter()
+for _ in range(20):
+    mix(sys.argv[2])
+warm = (time.perf_counter() - t0) / 20
+print(cold, warm, flush=True)
+sys.stdin.readline()
+"""
+
+
+def _smaps(pid: int) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                out[parts[0].rstrip(":")] = int(parts[1])
+    return out
+
+
+def _run(backend: str, root: Path, tx_id: str, workers: int) -> Dict[str, float]:
+    env = {**os.environ, "PYTHONPATH": os.getcwd(), "STORE_BACKEND": backend}
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-c", _WORKER, str(root), tx_id],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, env=env,
+        )
+        for _ in range(workers)
+    ]
+    try:
+        timings: List[List[float]] = []
+        for p in procs:
+            assert p.stdout is not None
+            line = ""
+            while not line[:1].isdigit():  # skip the [CONFIG] banner
+                line = p.stdout.readline()
+                if not line:
+                    raise RuntimeError(f"{backend} worker exited early")
+            timings.append([float(x) for x in line.split()])
+        mem = [_smaps(p.pid) for p in procs]
+    finally:
+        for p in procs:
+            if p.stdin is not None:
+                p.stdin.write("\n")
+                p.stdin.close()
+            p.wait()
+    mb = lambda key: sum(m[key] for m in mem) / 1024  # noqa: E731
+    return {
+        "cold_ms": max(t[0] for t in timings) * 1e3,
+        "warm_ms": sum(t[1] for t in timings) / len(timings) * 1e3,
+        "rss_mb": mb("Rss"),
+        "pss_mb": mb("Pss"),
+        "private_mb": mb("Private_Clean") + mb("Private_Dirty"),
+    }
+
+
+def main(n: int, workers: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        (root / "data").mkdir()
+        txs = make_transactions(n)
+        json_path = root / "data" / "txns_BENCH.json"
+        with open(json_path, "w") as f:
+            json.dump([t.model_dump(mode="json") for t in txs], f)
+        snapshot.write_snapshot(txs, snapshot.snapshot_path(json_path), snapshot.source_version(json_path))
+        tx_id = txs[n // 2].id
+        del txs
+
+        print(f"{n:,} rows, {workers} workers (first-request time is the slowest worker's)")
+        print(f"{'backend':>8} {'first req':>10} {'warm mix':>9} {'sum RSS':>9} {'sum PSS':>9} {'private':>9}")
+        for backend in ("memory", "mmap"):
+            r = _run(backend, root, tx_id, workers)
+            print(
+                f"{backend:>8} {r['cold_ms']:>8.0f}ms {r['warm_ms']:>7.2f}ms "
+                f"{r['rss_mb']:>7.0f}MB {r['pss_mb']:>7.0f}MB {r['private_mb']:>7.0f}MB"
+            )
+            time.sleep(0.5)
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(args[0] if args else 200_000, args[1] if len(args) > 1 else 4)
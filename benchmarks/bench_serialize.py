@@ -0,0 +1,90 @@
+"""
+Cost of GET /tool/transactions?limit=5000: handing FastAPI the Transaction
+list to encode (through jsonable_encoder, or through response_model
+validation) vs the raw JSON body joined from the index's cached per-row
+fragments. Encoding alone, then whole requests through a TestClient. Run
+from the repo root:
+
+    python -m benchmarks.bench_serialize [rows]     (default: 50000)
+"""
+from __future__ import annotations
+
+import json
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+
+from benchmarks.synth import make_transactions
+from src import mock_store
+from src.schemas import Transaction
+from src.serialize import json_array
+from src.tools_api import router
+
+LIMIT = 5000
+
+
+def _best_ms(fn, repeat: int = 10) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1e3
+
+
+def main(n: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        (root / "data").mkdir()
+        with open(root / "data" / "txns_BENCH.json", "w") as f:
+            json.dump([t.model_dump(mode="json") for t in make_transactions(n)], f)
+        mock_store._DATA_DIR = root
+
+        today = date.today()
+        params = {"accountId": "BENCH", "start": (today - timedelta(days=3 * 365)).isoformat(), "end": today.isoformat(), "limit": LIMIT}
+        index = mock_store.get_account_index("BENCH")
+        rows, _ = index.page(date.fromisoformat(params["start"]), today, True, LIMIT)
+        rows_adapter = TypeAdapter(list[Transaction])
+
+        # The pre-fast-path route, both ways FastAPI encodes a returned list
+        app = FastAPI()
+        app.include_router(router)
+
+        @app.get("/before/plain")
+        def before_plain():
+            return index.page(date.fromisoformat(params["start"]), today, True, LIMIT)[0]
+
+        @app.get("/before/model", response_model=list[Transaction])
+        def before_model():
+            return index.page(date.fromisoformat(params["start"]), today, True, LIMIT)[0]
+
+        client = TestClient(app)
+        bodies = [client.get(path, params=params).json() for path in ("/before/plain", "/before/model", "/tool/transactions")]
+        assert bodies[0] == bodies[1] == bodies[2], "fast path changed the response"
+
+        print(f"{len(rows):,} rows of a {n:,}-row account")
+        print(f"{'encoding only':<40} {'ms':>8}")
+        print(f"{'jsonable_encoder + json.dumps':<40} {_best_ms(lambda: json.dumps(jsonable_encoder(rows)).encode(), 3):>8.2f}")
+        print(f"{'response_model validate + dump':<40} {_best_ms(lambda: rows_adapter.dump_json(rows_adapter.validate_python(rows))):>8.2f}")
+        fresh = mock_store.AccountIndex(list(index.transactions))
+        print(f"{'fragments, first request (encode+cache)':<40} {_best_ms(lambda: json_array(fresh.json_fragments(rows)), 1):>8.2f}")
+        print(f"{'fragments, cached':<40} {_best_ms(lambda: json_array(index.json_fragments(rows))):>8.2f}")
+
+        print(f"\n{'whole request (TestClient)':<40} {'ms':>8}")
+        for label, path in (
+            ("before: no response_model", "/before/plain"),
+            ("before: response_model", "/before/model"),
+            ("after: /tool/transactions", "/tool/transactions"),
+        ):
+            print(f"{label:<40} {_best_ms(lambda: client.get(path, params=params), 5):>8.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
@@ -0,0 +1,89 @@
+"""
+Cold load of one account: data/txns_*.json (json.load + model_validate per
+record) vs the compiled .snap (src.snapshot). Each load runs in a fresh
+subprocess so the time and peak RSS are those of a worker's first request
+for the account (peak RSS is read from /proc, so Linux only). Run from the
+repo root:
+
+    python -m benchmarks.bench_snapshot [rows ...]     (default: 1000 100000 1000000)
+"""
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks.synth import make_transactions
+from src import snapshot
+
+# Runs in the child: import first so RSS before the load is the interpreter + app modules
+# (VmHWM rather than ru_maxrss, which carries the parent's peak across exec)
+_CHILD = """
+import sys, time
+from pathlib import Path
+from src import mock_store
+
+def hwm_kb():
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+
+mock_store.SNAPSHOT_ENABLED = sys.argv[2] == "snapshot"
+before = hwm_kb()
+t0 = time.perf_counter()
+index = mock_store._load_index(Path(sys.argv[1]))
+index.columns
+elapsed = time.perf_counter() - t0
+print(len(index), elapsed, before, hwm_kb())
+"""
+
+
+def _write_fixture(n: int, out_dir: Path) -> Path:
+    txs = make_transactions(n)
+    json_path = out_dir / f"txns_BENCH{n}.json"
+    with open(json_path, "w") as f:
+        json.dump([t.model_dump(mode="json") for t in txs], f)
+    # Same rows, so skip re-validating the JSON we just wrote
+    snapshot.write_snapshot(txs, snapshot.snapshot_path(json_path), snapshot.source_version(json_path))
+    return json_path
+
+
+def _cold_load(json_path: Path, mode: str) -> Dict[str, float]:
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD, str(json_path), mode],
+        capture_output=True, text=True, check=True,
+        env={**os.environ, "PYTHONPATH": os.getcwd()},
+    ).stdout.strip().splitlines()[-1]
+    rows, elapsed, before, peak = out.split()
+    return {"rows": int(rows), "ms": float(elapsed) * 1e3, "rss_mb": (int(peak) - int(before)) / 1024}
+
+
+def main(sizes: List[int]) -> None:
+    print(f"{'rows':>9} {'json MB':>8} {'snap MB':>8} {'json load':>11} {'snap load':>11} {'speedup':>8} {'json +RSS':>10} {'snap +RSS':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            t0 = time.perf_counter()
+            json_path = _write_fixture(n, Path(tmp))
+            setup_s = time.perf_counter() - t0
+            slow = _cold_load(json_path, "json")
+            fast = _cold_load(json_path, "snapshot")
+            assert slow["rows"] == fast["rows"] == n
+            print(
+                f"{n:>9,} "
+                f"{json_path.stat().st_size / 2**20:>8.1f} "
+                f"{snapshot.snapshot_path(json_path).stat().st_size / 2**20:>8.1f} "
+                f"{slow['ms']:>9.1f}ms {fast['ms']:>9.1f}ms "
+                f"{slow['ms'] / fast['ms']:>7.1f}x "
+                f"{slow['rss_mb']:>8.1f}MB {fast['rss_mb']:>8.1f}MB"
+                f"   (fixture {setup_s:.1f}s)"
+            )
+            for p in (json_path, snapshot.snapshot_path(json_path)):
+                p.unlink()
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1_000, 100_000, 1_000_000])
@@ -0,0 +1,113 @@
+"""
+Local stand-in for an Ollama server, for load tests. It answers
+/v1/chat/completions (and /api/chat) with a fixed QuerySpec JSON and models
+batched inference: a single engine runs in rounds. A round starts
+`gather_ms` after the engine sees a waiting request (its scheduler tick),
+takes up to `num_parallel` waiting requests and costs
+`round_ms + per_item_ms * size`. Requests that arrive while a round is
+running wait for the next one.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List
+
+SPEC_JSON = json.dumps({
+    "is_banking_domain": True,
+    "clarification_needed": False,
+    "clarification_question": None,
+    "query": {"intent": "transactions_list", "time_range": {"mode": "relative", "last": 30, "unit": "days"}, "params": {}},
+})
+
+
+class FakeOllama:
+    def __init__(self, num_parallel: int = 4, round_ms: float = 100.0, per_item_ms: float = 10.0, gather_ms: float = 2.0):
+        self.num_parallel = num_parallel
+        self.gather_ms = gather_ms
+        self.round_ms = round_ms
+        self.per_item_ms = per_item_ms
+        self.rounds: List[int] = []   # size of each round run
+        self._queue: Deque[threading.Event] = deque()
+        self._cond = threading.Condition()
+        self._stop = False
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/v1/chat/completions"
+
+    def start(self) -> "FakeOllama":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._engine, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self) -> None:
+        self.rounds = []
+
+    def infer(self) -> None:
+        done = threading.Event()
+        with self._cond:
+            self._queue.append(done)
+            self._cond.notify()
+        done.wait()
+
+    def _engine(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._stop:
+                    self._cond.wait()
+                if self._stop:
+                    return
+            time.sleep(self.gather_ms / 1e3)
+            with self._cond:
+                batch = [self._queue.popleft() for _ in range(min(self.num_parallel, len(self._queue)))]
+            self.rounds.append(len(batch))
+            time.sleep((self.round_ms + self.per_item_ms * len(batch)) / 1e3)
+            for done in batch:
+                done.set()
+
+    def _handler(self) -> type:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                fake.infer()
+                openai = self.path.startswith("/v1/")
+                if payload.get("stream"):
+                    if openai:
+                        chunk: Dict = {"choices": [{"delta": {"content": SPEC_JSON}}]}
+                        body = f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n".encode()
+                    else:
+                        body = (json.dumps({"message": {"content": SPEC_JSON}, "done": True}) + "\n").encode()
+                elif openai:
+                    body = json.dumps({"choices": [{"message": {"content": SPEC_JSON}}]}).encode()
+                else:
+                    body = json.dumps({"message": {"content": SPEC_JSON}}).encode()
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client gave up (e.g. stopped reading a stream early)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
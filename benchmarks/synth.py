@@ -0,0 +1,52 @@
+"""Synthetic transaction generator shared by the benchmark scripts."""
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from src.schemas import Merchant, Transaction
+
+MERCHANTS = [
+    Merchant(name="Whole Foods", category="Groceries", subcategory="Supermarket"),
+    Merchant(name="Amazon", category="Shopping", subcategory="Online Retail"),
+    Merchant(name="Main Street Apartments", category="Housing", subcategory="Rent"),
+    Merchant(name="PECO", category="Utilities", subcategory="Electric"),
+    Merchant(name="SEPTA", category="Transport", subcategory="Transit"),
+    Merchant(name="Netflix", category="Entertainment", subcategory="Streaming"),
+    Merchant(name="Spotify", category="Entertainment", subcategory="Streaming"),
+    Merchant(name="Shell", category="Transport", subcategory="Fuel"),
+    Merchant(name="Starbucks", category="Dining", subcategory="Coffee"),
+    Merchant(name="Employer Inc", category="Income", subcategory="Payroll"),
+]
+RAILS = ["Card", "ACH", "Zelle", "Wire", "Check", "ATM"]
+
+
+def make_transactions(n: int, account_id: str = "BENCH", days: int = 3 * 365, seed: int = 7) -> List[Transaction]:
+    """
+    Build `n` transactions spread over the last `days` days.
+    Uses model_construct so generating 1M rows stays cheap; the data is already well-formed.
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    out: List[Transaction] = []
+    for i in range(n):
+        merchant = MERCHANTS[rng.randrange(len(MERCHANTS))]
+        rail = RAILS[rng.randrange(len(RAILS))]
+        out.append(Transaction.model_construct(
+            id=f"t{i:07d}",
+            accountId=account_id,
+            postedAt=now - timedelta(seconds=rng.randrange(days * 86400)),
+            direction="credit" if merchant.category == "Income" else "debit",
+            amount=round(rng.uniform(1, 500), 2),
+            merchant=merchant,
+            isPending=rng.random() < 0.03,
+            paymentRail=rail,
+            cardLast4="4242" if rail == "Card" else None,
+        ))
+    return out
+
+
+def make_raw_transactions(n: int, account_id: str = "BENCH", days: int = 3 * 365, seed: int = 7) -> List[dict]:
+    """Same rows as make_transactions, in the JSON shape of data/txns_*.json."""
+    return [t.model_dump(mode="json") for t in make_transactions(n, account_id=account_id, days=days, seed=seed)]
@@ -0,0 +1,91 @@
+"""
+Which accounts get used, persisted so a restarted process knows what to pre-warm.
+
+get_account_index() counts each read of an existing account in memory (not
+pre-warming, ingestion or compaction); flush() folds the counts
+into ACCESS_LOG_PATH as exponentially decayed scores (halving every
+ACCESS_LOG_HALF_LIFE_HOURS), so "top N" means recently busy, not busy once.
+The file is shared by all worker processes: flush() re-reads it and merges
+under the same kind of flock the ingestion log uses.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from . import wal
+from .config import ACCESS_LOG_HALF_LIFE_HOURS, ACCESS_LOG_PATH
+
+_PATH = Path(__file__).resolve().parents[1] / ACCESS_LOG_PATH
+
+# Scores below this after decay are dropped so the file doesn't grow without bound
+_MIN_SCORE = 0.01
+
+_lock = threading.Lock()
+_pending: Dict[str, int] = {}
+
+
+def record(account_id: str) -> None:
+    with _lock:
+        _pending[account_id] = _pending.get(account_id, 0) + 1
+
+
+def _decayed(score: float, since: float, now: float) -> float:
+    half_life = ACCESS_LOG_HALF_LIFE_HOURS * 3600
+    if half_life <= 0:
+        return score
+    return score * 0.5 ** (max(0.0, now - since) / half_life)
+
+
+def _read(path: Path) -> Dict[str, Dict[str, float]]:
+    try:
+        with open(path) as f:
+            return json.load(f).get("accounts", {})
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, AttributeError) as e:
+        print(f"[ACCESS] Ignoring unreadable {path.name}: {e}")
+        return {}
+
+
+def flush(path: Path = _PATH) -> int:
+    """Merge the counts recorded since the last flush into the file; returns how many were written."""
+    with _lock:
+        counts = dict(_pending)
+        _pending.clear()
+    if not counts:
+        return 0
+    now = time.time()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with wal.locked(path):
+            accounts = {
+                account_id: {"score": _decayed(e["score"], e["at"], now), "at": now}
+                for account_id, e in _read(path).items()
+            }
+            for account_id, n in counts.items():
+                accounts.setdefault(account_id, {"score": 0.0, "at": now})["score"] += n
+            accounts = {a: e for a, e in accounts.items() if e["score"] >= _MIN_SCORE}
+            tmp = path.with_name(path.name + ".tmp")
+            with open(tmp, "w") as f:
+                json.dump({"accounts": accounts}, f)
+            tmp.replace(path)
+    except OSError as e:
+        print(f"[ACCESS] Can't write {path.name} ({e}); keeping counts for the next flush")
+        with _lock:
+            for account_id, n in counts.items():
+                _pending[account_id] = _pending.get(account_id, 0) + n
+        return 0
+    return sum(counts.values())
+
+
+def top(n: int, path: Path = _PATH) -> List[str]:
+    """The n accounts with the highest decayed score in the file, busiest first."""
+    if n <= 0:
+        return []
+    now = time.time()
+    scores = {a: _decayed(e["score"], e["at"], now) for a, e in _read(path).items()}
+    return sorted(scores, key=lambda a: (-scores[a], a))[:n]
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .columnar import ColumnarTransactions
+
+# group-by key -> (code column, label dictionary) on ColumnarTransactions
+GROUP_KEYS: Dict[str, Tuple[str, str]] = {
+    "category": ("category_codes", "categories"),
+    "merchant": ("merchant_codes", "merchants"),
+    "subcategory": ("subcategory_codes", "subcategories"),
+    "paymentRail": ("rail_codes", "rails"),
+    "cardLast4": ("card_codes", "cards"),
+}
+
+
+@dataclass
+class GroupTotals:
+    """Per-label amount totals and row counts for one group-by key."""
+    labels: List[str]
+    totals: np.ndarray
+    counts: np.ndarray
+
+    def top(self, k: int) -> List[Tuple[str, float]]:
+        """
+        The k largest totals, descending; ties keep first-seen label order.
+        Uses a partial selection, so only the candidates are fully sorted.
+        """
+        present = np.flatnonzero(self.counts)
+        if k <= 0 or present.size == 0:
+            return []
+        values = self.totals[present]
+        if k < present.size:
+            # Everything >= the k-th largest value, so ties on the boundary are kept for the stable sort below
+            kth = np.partition(values, present.size - k)[present.size - k]
+            keep = values >= kth
+            present, values = present[keep], values[keep]
+        order = np.argsort(-values, kind="stable")[:k]
+        return [(self.labels[i], float(self.totals[i])) for i in present[order]]
+
+    def as_dict(self) -> Dict[str, float]:
+        return {self.labels[i]: float(self.totals[i]) for i in np.flatnonzero(self.counts)}
+
+    def __add__(self, other: "GroupTotals") -> "GroupTotals":
+        # Only meaningful for totals built over the same label dictionary
+        if other.labels is not self.labels:
+            raise ValueError("GroupTotals can only be added over the same label dictionary")
+        return GroupTotals(labels=self.labels, totals=self.totals + other.totals, counts=self.counts + other.counts)
+
+
+@dataclass
+class SpendBreakdown:
+    """Posted-debit total plus per-key group totals; what the spending handlers render."""
+    total: float
+    groups: Dict[str, GroupTotals]
+
+    def __add__(self, other: "SpendBreakdown") -> "SpendBreakdown":
+        return SpendBreakdown(
+            total=self.total + other.total,
+            groups={k: self.groups[k] + other.groups[k] for k in self.groups},
+        )
+
+
+def group_totals(
+    cols: ColumnarTransactions,
+    keys: Sequence[str],
+    mask: Optional[np.ndarray] = None,
+) -> Dict[str, GroupTotals]:
+    """
+    Sum `amount` per label for every key in `keys` over the rows selected by
+    `mask`, in one bincount: each key's codes are shifted into its own range
+    of a shared code space, so adding a key adds no extra pass.
+    """
+    for key in keys:
+        if key not in GROUP_KEYS:
+            raise ValueError(f"unknown group-by key: {key}")
+
+    amounts = cols.amount if mask is None else cols.amount[mask]
+    code_parts: List[np.ndarray] = []
+    offsets: List[int] = []
+    width = 0
+    for key in keys:
+        code_attr, label_attr = GROUP_KEYS[key]
+        codes = getattr(cols, code_attr)
+        code_parts.append((codes if mask is None else codes[mask]) + width)
+        offsets.append(width)
+        width += len(getattr(cols, label_attr))
+
+    if not code_parts:
+        return {}
+    all_codes = np.concatenate(code_parts)
+    all_amounts = np.tile(amounts, len(keys))
+    totals = np.bincount(all_codes, weights=all_amounts, minlength=width)
+    counts = np.bincount(all_codes, minlength=width)
+
+    out: Dict[str, GroupTotals] = {}
+    for key, lo in zip(keys, offsets):
+        labels = getattr(cols, GROUP_KEYS[key][1])
+        hi = lo + len(labels)
+        out[key] = GroupTotals(labels=labels, totals=totals[lo:hi], counts=counts[lo:hi])
+    return out
+
+
+def spend_breakdown(cols: ColumnarTransactions, keys: Sequence[str] = ("category", "merchant")) -> SpendBreakdown:
+    """Posted-debit breakdown straight from raw rows."""
+    spend = cols.posted_spend_mask()
+    return SpendBreakdown(
+        total=float(cols.amount[spend].sum()),
+        groups=group_totals(cols, keys, mask=spend),
+    )
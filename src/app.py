@@ -1,13 +1,26 @@
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 from .tools_api import router as tools_router
 from .chat_api import router as chat_router
-import httpx
-from src.config import OLLAMA_MODEL, OLLAMA_URL
+from src import access_log
+from src.config import ACCESS_LOG_FLUSH_SECONDS, OLLAMA_MODEL, OLLAMA_URL, WAL_COMPACT_INTERVAL_SECONDS
+from src.http_clients import clients
+from src.llm import llm_stats
+from src.mock_store import cache_stats, compact_all
+from src.prefetch import prefetch_stats
+from src.prewarm import prewarmer
+from src.query_spec_builder import compile_stats
+from src.spec_cache import spec_cache
+from src.tool_backend import tool_cache_stats
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Warmup the LLM model on startup to keep it in memory"""
+    """Open the shared HTTP clients, start pre-warming hot accounts, and warm up the LLM model on startup to keep it in memory"""
+    clients.start()
+    # In the background: the app serves (and /health answers) while accounts load; GET /ready tracks it
+    prewarm = asyncio.create_task(prewarmer.run())
     print("=" * 60)
     print("[WARMUP] LIFESPAN STARTED - Beginning model warmup")
     print(f"[WARMUP] Model: {OLLAMA_MODEL}")
@@ -15,30 +28,57 @@ async def lifespan(app: FastAPI):
     print("=" * 60)
     
     try:
-        async with httpx.AsyncClient(timeout=120) as client:
-            payload = {
-                "model": OLLAMA_MODEL,
-                "stream": False,
-                "messages": [
-                    {"role": "user", "content": "Hello"}
-                ],
-            }
-            print(f"[WARMUP] Sending request to Ollama...")
-            r = await client.post(OLLAMA_URL, json=payload)
-            r.raise_for_status()
-            print("=" * 60)
-            print(f"[WARMUP] ✅ SUCCESS - Model {OLLAMA_MODEL} is loaded and ready!")
-            print("=" * 60)
+        client = clients.get("llm")
+        payload = {
+            "model": OLLAMA_MODEL,
+            "stream": False,
+            "messages": [
+                {"role": "user", "content": "Hello"}
+            ],
+        }
+        print(f"[WARMUP] Sending request to Ollama...")
+        r = await client.post(OLLAMA_URL, json=payload)
+        r.raise_for_status()
+        print("=" * 60)
+        print(f"[WARMUP] ✅ SUCCESS - Model {OLLAMA_MODEL} is loaded and ready!")
+        print("=" * 60)
     except Exception as e:
         print("=" * 60)
         print(f"[WARMUP] ❌ FAILED - Model warmup error: {e}")
         print(f"[WARMUP] Model will be loaded on first user request")
         print("=" * 60)
     
+    compactor = asyncio.create_task(_compact_periodically()) if WAL_COMPACT_INTERVAL_SECONDS > 0 else None
+    flusher = asyncio.create_task(_flush_access_log_periodically()) if ACCESS_LOG_FLUSH_SECONDS > 0 else None
+
     yield  # Application runs here
     
-    # Cleanup on shutdown (if needed)
+    # Cleanup on shutdown
     print("[SHUTDOWN] Application shutting down")
+    prewarm.cancel()
+    for task in (compactor, flusher):
+        if task is not None:
+            task.cancel()
+    access_log.flush()
+    await clients.aclose()
+
+async def _compact_periodically():
+    """Fold ingestion logs back into the account data files every WAL_COMPACT_INTERVAL_SECONDS."""
+    while True:
+        await asyncio.sleep(WAL_COMPACT_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(compact_all)
+        except Exception as e:
+            print(f"[WAL] Compaction failed: {e}")
+
+async def _flush_access_log_periodically():
+    """Persist account access counts every ACCESS_LOG_FLUSH_SECONDS for the next startup's pre-warm."""
+    while True:
+        await asyncio.sleep(ACCESS_LOG_FLUSH_SECONDS)
+        try:
+            await asyncio.to_thread(access_log.flush)
+        except Exception as e:
+            print(f"[ACCESS] Flush failed: {e}")
 
 print("[DEBUG] Creating FastAPI app with lifespan...")
 app = FastAPI(
@@ -51,4 +91,22 @@ app.include_router(chat_router)
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    """200 once startup pre-warming has finished (503 until then), with per-account warm status."""
+    status = prewarmer.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/metrics")
+def metrics():
+    return {
+        "store_cache": cache_stats(),
+        "queryspec_cache": spec_cache.stats(),
+        "queryspec_compile": compile_stats(),
+        "llm": llm_stats(),
+        "prefetch": prefetch_stats(),
+        "tool_response_cache": tool_cache_stats(),
+        "prewarm": prewarmer.status()["counts"],
+    }
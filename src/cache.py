@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass
+class _Entry(Generic[V]):
+    value: V
+    version: Any
+    stored_at: float
+
+
+class LRUCache(Generic[K, V]):
+    """
+    Size-bounded, thread-safe LRU cache with an optional TTL.
+
+    Each entry can carry a `version` token (e.g. a file's mtime/inode); a get()
+    with a different version drops the stale entry and counts as a miss.
+    `on_evict(key, value)` runs whenever an entry leaves the cache for any reason.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: Optional[float] = None,
+        on_evict: Optional[Callable[[K, V], None]] = None,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be >= 1")
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self._on_evict = on_evict
+        self._data: "OrderedDict[K, _Entry[V]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+    def get(self, key: K, version: Any = None) -> Optional[V]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if self.ttl_seconds is not None and time.monotonic() - entry.stored_at > self.ttl_seconds:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            if version is not None and entry.version != version:
+                self._remove(key)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def put(self, key: K, value: V, version: Any = None) -> None:
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = _Entry(value=value, version=version, stored_at=time.monotonic())
+            while len(self._data) > self.max_size:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def replace(self, key: K, value: V, version: Any = None) -> None:
+        """
+        Update a present entry's value (and version, if given) without on_evict
+        running for the old value: it is being updated, not leaving. Puts if absent.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                entry.value = value
+                if version is not None:
+                    entry.version = version
+                self._data.move_to_end(key)
+                return
+        self.put(key, value, version)
+
+    def pop(self, key: K) -> Optional[V]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            self._remove(key)
+            return entry.value
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._data):
+                self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: K) -> None:
+        entry = self._data.pop(key)
+        if self._on_evict is not None:
+            self._on_evict(key, entry.value)
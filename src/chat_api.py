@@ -1,7 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
 
 from src.orchestrator import orchestrate_chat
 from src.schemas import ChatRequest, ChatResponse
+from src.serialize import RawJSONResponse, dumps
 
 router = APIRouter(tags=["chat"])
 
@@ -10,11 +11,13 @@ router = APIRouter(tags=["chat"])
 # ----------------------------
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest) -> ChatResponse:
+async def chat(req: ChatRequest) -> Response:
     """
     Chat endpoint that delegates to the orchestrator.
     
     Handles user messages, routes them through query compilation,
-    and returns UI specifications for the frontend.
+    and returns UI specifications for the frontend. The orchestrator built
+    the ChatResponse from validated parts, so it is encoded directly rather
+    than re-validated against response_model (which stays for the docs).
     """
-    return await orchestrate_chat(req)
\ No newline at end of file
+    return RawJSONResponse(dumps(await orchestrate_chat(req)))
\ No newline at end of file
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .schemas import Transaction
+
+_EPOCH_DAY = date(1970, 1, 1)
+
+
+def _encode(values: Iterable[Optional[str]], count: int) -> Tuple[np.ndarray, List[str]]:
+    """Dictionary-encode strings into int32 codes, numbered in first-seen order (None -> "")."""
+    lookup: Dict[str, int] = {}
+    codes = np.fromiter(
+        (lookup.setdefault(v or "", len(lookup)) for v in values),
+        dtype=np.int32,
+        count=count,
+    )
+    return codes, list(lookup)
+
+
+def day_number(d: date) -> int:
+    """Days since 1970-01-01; the unit of `posted_day`."""
+    return (d - _EPOCH_DAY).days
+
+
+class ColumnarTransactions:
+    """
+    Parallel-array view of a list of transactions for analytics.
+
+    Row i of every column describes the same transaction, in the order the
+    source list was given (for an AccountIndex: oldest first). String fields
+    are dictionary-encoded: `category_codes[i]` indexes into `categories`.
+    `posted_day` is the transaction's local posting date as a day number, so
+    date filters match `tx.postedAt.date()` exactly.
+    """
+
+    __slots__ = (
+        "posted_at", "tz_offset_min", "posted_day", "amount", "is_debit", "is_pending",
+        "merchant_codes", "merchants", "category_codes", "categories",
+        "subcategory_codes", "subcategories", "rail_codes", "rails",
+        "card_codes", "cards",
+    )
+
+    posted_at: np.ndarray         # int64 epoch seconds
+    tz_offset_min: np.ndarray     # int16 UTC offset of postedAt, minutes
+    posted_day: np.ndarray        # int32 day number of postedAt.date()
+    amount: np.ndarray            # float64
+    is_debit: np.ndarray          # bool
+    is_pending: np.ndarray        # bool
+    merchant_codes: np.ndarray
+    merchants: List[str]
+    category_codes: np.ndarray
+    categories: List[str]
+    subcategory_codes: np.ndarray
+    subcategories: List[str]
+    rail_codes: np.ndarray
+    rails: List[str]
+    card_codes: np.ndarray
+    cards: List[str]
+
+    def __len__(self) -> int:
+        return int(self.amount.shape[0])
+
+    @classmethod
+    def from_transactions(cls, txs: Sequence[Transaction]) -> "ColumnarTransactions":
+        n = len(txs)
+        cols = cls.__new__(cls)
+        offsets = [_offset_minutes(t.postedAt) for t in txs]
+        cols.posted_at = np.fromiter((_epoch_seconds(t.postedAt) for t in txs), dtype=np.int64, count=n)
+        cols.tz_offset_min = np.array(offsets, dtype=np.int16)
+        cols.posted_day = ((cols.posted_at + cols.tz_offset_min.astype(np.int64) * 60) // 86400).astype(np.int32)
+        cols.amount = np.fromiter((t.amount for t in txs), dtype=np.float64, count=n)
+        cols.is_debit = np.fromiter((t.direction == "debit" for t in txs), dtype=np.bool_, count=n)
+        cols.is_pending = np.fromiter((t.isPending for t in txs), dtype=np.bool_, count=n)
+        cols.merchant_codes, cols.merchants = _encode((t.merchant.name for t in txs), n)
+        cols.category_codes, cols.categories = _encode((t.merchant.category for t in txs), n)
+        cols.subcategory_codes, cols.subcategories = _encode((t.merchant.subcategory for t in txs), n)
+        cols.rail_codes, cols.rails = _encode((t.paymentRail for t in txs), n)
+        cols.card_codes, cols.cards = _encode((t.cardLast4 for t in txs), n)
+        return cols
+
+    def slice(self, lo: int, hi: int) -> "ColumnarTransactions":
+        """Rows [lo, hi) as array views; dictionaries are shared, not copied."""
+        out = ColumnarTransactions.__new__(ColumnarTransactions)
+        for name in self.__slots__:
+            value = getattr(self, name)
+            setattr(out, name, value[lo:hi] if isinstance(value, np.ndarray) else value)
+        return out
+
+    def delete(self, rows: Sequence[int]) -> "ColumnarTransactions":
+        """Copy without the given rows; dictionaries are shared."""
+        out = ColumnarTransactions.__new__(ColumnarTransactions)
+        for name in self.__slots__:
+            value = getattr(self, name)
+            setattr(out, name, np.delete(value, rows) if isinstance(value, np.ndarray) else value)
+        return out
+
+    def insert(self, at: Sequence[int], txs: Sequence[Transaction]) -> "ColumnarTransactions":
+        """
+        Copy with `txs` inserted before rows `at` (np.insert semantics: indices
+        into this view, one per transaction). Labels not seen before are
+        appended to copies of the dictionaries, so existing codes keep meaning.
+        """
+        add = ColumnarTransactions.from_transactions(txs)
+        out = ColumnarTransactions.__new__(ColumnarTransactions)
+        for name in ("posted_at", "tz_offset_min", "posted_day", "amount", "is_debit", "is_pending"):
+            setattr(out, name, np.insert(getattr(self, name), at, getattr(add, name)))
+        for codes_name, labels_name in _DICTIONARIES:
+            labels = list(getattr(self, labels_name))
+            lookup = {label: i for i, label in enumerate(labels)}
+            for label in getattr(add, labels_name):
+                if label not in lookup:
+                    lookup[label] = len(labels)
+                    labels.append(label)
+            remap = np.array([lookup[label] for label in getattr(add, labels_name)], dtype=np.int32)
+            setattr(out, codes_name, np.insert(getattr(self, codes_name), at, remap[getattr(add, codes_name)]))
+            setattr(out, labels_name, labels)
+        return out
+
+    def day_bounds(self, start: date, end: date) -> Tuple[int, int]:
+        """Row bounds for start <= posted date <= end; rows must be sorted by posted_day."""
+        lo = int(np.searchsorted(self.posted_day, day_number(start), side="left"))
+        hi = int(np.searchsorted(self.posted_day, day_number(end), side="right"))
+        return lo, hi
+
+    def posted_spend_mask(self) -> np.ndarray:
+        """Posted debits: the population every spend analytic works on."""
+        return self.is_debit & ~self.is_pending
+
+    def posted_datetime(self, i: int) -> datetime:
+        tz = timezone(timedelta(minutes=int(self.tz_offset_min[i])))
+        return datetime.fromtimestamp(int(self.posted_at[i]), tz)
+
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.__slots__ if isinstance(getattr(self, name), np.ndarray))
+
+
+_DICTIONARIES = (
+    ("merchant_codes", "merchants"),
+    ("category_codes", "categories"),
+    ("subcategory_codes", "subcategories"),
+    ("rail_codes", "rails"),
+    ("card_codes", "cards"),
+)
+
+
+def _offset_minutes(dt: datetime) -> int:
+    off = dt.utcoffset()
+    return int(off.total_seconds() // 60) if off is not None else 0
+
+
+def _epoch_seconds(dt: datetime) -> int:
+    # Naive timestamps are treated as UTC, matching how the data files are written
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
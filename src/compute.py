@@ -1,9 +1,13 @@
 from __future__ import annotations
 
 from datetime import date, timedelta
-from statistics import median
-from typing import Any, Dict, List, Tuple
+from typing import Any, List, Tuple, Union
 
+import numpy as np
+
+from .aggregate import SpendBreakdown, spend_breakdown
+from .columnar import ColumnarTransactions
+from .recurring import RecurringWindow, classify_cadence
 from .schemas import (
     QuerySpec,
     TimeRange,
@@ -30,6 +34,14 @@ def is_spend(tx: Transaction) -> bool:
 def is_posted(tx: Transaction) -> bool:
     return not tx.isPending
 
+# Analytics handlers accept either model objects or an already-built columnar view
+TxData = Union[List[Transaction], ColumnarTransactions]
+
+def as_columns(txs: TxData) -> ColumnarTransactions:
+    if isinstance(txs, ColumnarTransactions):
+        return txs
+    return ColumnarTransactions.from_transactions(txs)
+
 def _month_bounds(d: date) -> Tuple[date, date]:
     start = d.replace(day=1)
     if start.month == 12:
@@ -193,22 +205,15 @@ def handle_transactions_list(q: QuerySpec, txs: List[Transaction]) -> UISpec:
     return ui
 
 
-def handle_top_spending_ytd(q: QuerySpec, txs: List[Transaction]) -> UISpec:
-    # posted debits only for analytics
-    spend = [t for t in txs if is_spend(t) and is_posted(t)]
+def handle_top_spending_ytd(q: QuerySpec, txs: Union[TxData, SpendBreakdown]) -> UISpec:
+    # posted debits only for analytics; a SpendBreakdown (e.g. from the store's monthly rollup) is already that
+    breakdown = txs if isinstance(txs, SpendBreakdown) else spend_breakdown(as_columns(txs))
 
-    total = sum(t.amount for t in spend)
+    total = breakdown.total
     top_k = int(q.params.get("top_k", 5))
 
-    by_cat: Dict[str, float] = {}
-    by_merch: Dict[str, float] = {}
-
-    for t in spend:
-        by_cat[t.merchant.category] = by_cat.get(t.merchant.category, 0.0) + t.amount
-        by_merch[t.merchant.name] = by_merch.get(t.merchant.name, 0.0) + t.amount
-
-    top_categories = sorted(by_cat.items(), key=lambda x: x[1], reverse=True)[:top_k]
-    top_merchants = sorted(by_merch.items(), key=lambda x: x[1], reverse=True)[:top_k]
+    top_categories = breakdown.groups["category"].top(top_k)
+    top_merchants = breakdown.groups["merchant"].top(top_k)
 
     ui = UISpec(
         messages=[UIMessage(content=f"Total spending (posted debits): **{money(total)}**")],
@@ -263,64 +268,41 @@ def handle_unrecognized_transaction(tx: Transaction) -> UISpec:
 # Recurring detection (pure deterministic)
 # --------------------------
 
-def _classify_cadence(median_gap_days: float) -> str:
-    targets = [
-        ("weekly", 7),
-        ("biweekly", 14),
-        ("monthly", 30),
-        ("quarterly", 90),
-        ("yearly", 365),
-    ]
-    best_name = "unknown"
-    best_score = 0.0
-
-    for name, target in targets:
-        diff = abs(median_gap_days - target)
-        score = max(0.0, 1.0 - (diff / target))  # 1.0 is perfect match
-        if score > best_score:
-            best_name = name
-            best_score = score
-
-    # Require a decent match; otherwise call it unknown
-    return best_name if best_score >= 0.75 else "unknown"
-
-
-def detect_recurring_payments(txs: List[Transaction], min_occurrences: int = 3) -> List[RecurringPayment]:
+def detect_recurring_payments(txs: TxData, min_occurrences: int = 3) -> List[RecurringPayment]:
+    cols = as_columns(txs)
     # posted debits only
-    debits = [t for t in txs if is_spend(t) and is_posted(t)]
+    rows = np.flatnonzero(cols.posted_spend_mask())
+    if rows.size == 0:
+        return []
 
-    by_merchant: Dict[str, List[Transaction]] = {}
-    for t in debits:
-        by_merchant.setdefault(t.merchant.name, []).append(t)
+    # group by merchant, chronological within each group
+    rows = rows[np.lexsort((cols.posted_at[rows], cols.merchant_codes[rows]))]
+    merch_codes = cols.merchant_codes[rows]
+    starts = np.flatnonzero(np.r_[True, merch_codes[1:] != merch_codes[:-1]])
+    ends = np.r_[starts[1:], rows.size]
 
     out: List[RecurringPayment] = []
 
-    for merch, items in by_merchant.items():
-        if len(items) < min_occurrences:
+    for lo, hi in zip(starts, ends):
+        n = int(hi - lo)
+        if n < min_occurrences or n < 2:
             continue
+        group = rows[lo:hi]
+        gaps = np.diff(cols.posted_day[group])
 
-        items.sort(key=lambda t: t.postedAt)
-        gaps: List[int] = []
-        for i in range(1, len(items)):
-            gaps.append((items[i].postedAt.date() - items[i - 1].postedAt.date()).days)
-
-        if not gaps:
-            continue
-
-        med = float(median(gaps))
-        cadence = _classify_cadence(med)
+        med = float(np.median(gaps))
+        cadence = classify_cadence(med)
         if cadence == "unknown":
             continue
 
-        avg_amt = sum(t.amount for t in items) / len(items)
-        last_seen = items[-1].postedAt
+        avg_amt = float(cols.amount[group].mean())
 
         out.append(RecurringPayment(
-            merchant=merch,
+            merchant=cols.merchants[merch_codes[lo]],
             cadence=cadence,  # type: ignore
             averageAmount=round(avg_amt, 2),
-            occurrences=len(items),
-            lastSeenAt=last_seen,
+            occurrences=n,
+            lastSeenAt=cols.posted_datetime(int(group[-1])),
         ))
 
     # sort: most frequent & largest first
@@ -328,9 +310,13 @@ def detect_recurring_payments(txs: List[Transaction], min_occurrences: int = 3)
     return out
 
 
-def handle_recurring_payments(q: QuerySpec, txs: List[Transaction]) -> UISpec:
+def handle_recurring_payments(q: QuerySpec, txs: Union[TxData, RecurringWindow]) -> UISpec:
     min_occ = int(q.params.get("min_occurrences", 3))
-    rec = detect_recurring_payments(txs, min_occurrences=min_occ)
+    if isinstance(txs, RecurringWindow):
+        # incremental detector state kept by the store; no regrouping needed
+        rec = txs.detect(min_occurrences=min_occ)
+    else:
+        rec = detect_recurring_payments(txs, min_occurrences=min_occ)
 
     rows: List[List[Any]] = []
     for r in rec[:25]:
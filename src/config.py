@@ -8,11 +8,81 @@ load_dotenv(env_path)
 
 # Environment configuration
 TOOL_BASE_URL = os.getenv("TOOL_BASE_URL", "http://localhost:8000")
+# "inprocess" reads the store directly; "http" calls TOOL_BASE_URL (store in another service)
+TOOL_BACKEND = os.getenv("TOOL_BACKEND", "inprocess").lower()
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/v1/chat/completions")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2:latest")
+# Stream the completion and stop reading once the JSON "query" object is complete
+LLM_STREAMING = os.getenv("LLM_STREAMING", "true").lower() in ("1", "true", "yes")
+
+# Transaction store cache: max accounts held in memory, and optional TTL (0 = no expiry)
+STORE_CACHE_MAX_ACCOUNTS = int(os.getenv("STORE_CACHE_MAX_ACCOUNTS", "256"))
+STORE_CACHE_TTL_SECONDS = float(os.getenv("STORE_CACHE_TTL_SECONDS", "0"))
+# Load data/txns_X.snap (python -m src.snapshot) instead of the JSON when it is up to date
+SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "true").lower() in ("1", "true", "yes")
+# "memory": each process holds the account's Transaction objects. "mmap": accounts are served
+# from memory-mapped snapshots shared by all workers, compiling them on first use if needed
+STORE_BACKEND = os.getenv("STORE_BACKEND", "memory").lower()
+# Ingestion write-ahead log: fsync each append, and how often the log is folded back into
+# the account's JSON/snapshot (0 = only on demand)
+WAL_FSYNC = os.getenv("WAL_FSYNC", "true").lower() in ("1", "true", "yes")
+WAL_COMPACT_INTERVAL_SECONDS = float(os.getenv("WAL_COMPACT_INTERVAL_SECONDS", "300"))
+
+# Startup pre-warming (in the background; GET /ready reports progress): accounts always warmed,
+# plus the N most accessed recently according to the access log, loaded this many at a time
+PREWARM_ACCOUNTS = [a.strip() for a in os.getenv("PREWARM_ACCOUNTS", "").split(",") if a.strip()]
+PREWARM_TOP_N = int(os.getenv("PREWARM_TOP_N", "0"))
+PREWARM_CONCURRENCY = int(os.getenv("PREWARM_CONCURRENCY", "2"))
+# Per-account access counts, decayed by half every ACCESS_LOG_HALF_LIFE_HOURS, shared by all
+# workers through ACCESS_LOG_PATH (relative to the project root; state/ is its own volume in
+# docker-compose, apart from the data) and flushed every interval
+ACCESS_LOG_PATH = os.getenv("ACCESS_LOG_PATH", "state/access_log.json")
+ACCESS_LOG_FLUSH_SECONDS = float(os.getenv("ACCESS_LOG_FLUSH_SECONDS", "60"))
+ACCESS_LOG_HALF_LIFE_HOURS = float(os.getenv("ACCESS_LOG_HALF_LIFE_HOURS", "24"))
+
+# Tool API responses: Cache-Control max-age (0 = revalidate every time via ETag), and the
+# HTTP tool backend's local cache of ETagged responses
+TOOL_CACHE_MAX_AGE_SECONDS = int(os.getenv("TOOL_CACHE_MAX_AGE_SECONDS", "0"))
+TOOL_CLIENT_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CLIENT_CACHE_MAX_ENTRIES", "256"))
+
+# POST /tool/transactions:batch: accounts processed at once (each in a worker thread)
+TOOL_BATCH_MAX_CONCURRENCY = int(os.getenv("TOOL_BATCH_MAX_CONCURRENCY", "8"))
+
+# Shared HTTP clients (see src/http_clients.py): pool limits, keep-alive, HTTP/2, per-upstream timeouts
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() in ("1", "true", "yes")
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+
+# Parallel request slots configured on the Ollama server (its OLLAMA_NUM_PARALLEL)
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+
+# LLM admission: concurrent upstream calls, callers allowed to queue for a slot, and max queue wait (0 = no limit)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", str(OLLAMA_NUM_PARALLEL)))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "30"))
+
+# Micro-batching: hold LLM calls up to this many ms (0 = off) and send them as one wave of at most LLM_BATCH_MAX_SIZE
+LLM_BATCH_WINDOW_MS = float(os.getenv("LLM_BATCH_WINDOW_MS", "0"))
+LLM_BATCH_MAX_SIZE = int(os.getenv("LLM_BATCH_MAX_SIZE", str(OLLAMA_NUM_PARALLEL)))
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "20"))
+
+# QuerySpec cache in front of the LLM compiler; fuzzy threshold is a trigram cosine in (0, 1], 0 disables
+SPEC_CACHE_MAX_ENTRIES = int(os.getenv("SPEC_CACHE_MAX_ENTRIES", "1024"))
+SPEC_CACHE_TTL_SECONDS = float(os.getenv("SPEC_CACHE_TTL_SECONDS", "3600"))
+SPEC_CACHE_FUZZY_THRESHOLD = float(os.getenv("SPEC_CACHE_FUZZY_THRESHOLD", "0"))
+
+# Fetch the rules-guessed data while the LLM compiles; reused when the final QuerySpec agrees
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Rules-first compile: rules results at or above this confidence skip the LLM (set > 1 to always ask the LLM)
+RULES_CONFIDENCE_THRESHOLD = float(os.getenv("RULES_CONFIDENCE_THRESHOLD", "0.85"))
 
 # Debug logging
 print(f"[CONFIG] TOOL_BASE_URL: {TOOL_BASE_URL}")
+print(f"[CONFIG] TOOL_BACKEND: {TOOL_BACKEND}")
 print(f"[CONFIG] OLLAMA_URL: {OLLAMA_URL}")
 print(f"[CONFIG] OLLAMA_MODEL: {OLLAMA_MODEL}")
 print(f"[CONFIG] .env path: {env_path}, exists: {env_path.exists()}")
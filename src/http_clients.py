@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import importlib.util
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional, Tuple, TypeVar
+
+import httpx
+
+from src.cache import LRUCache
+from src.config import (
+    HTTP2_ENABLED,
+    HTTP_CONNECT_TIMEOUT_SECONDS,
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
+    LLM_TIMEOUT_SECONDS,
+    TOOL_CLIENT_CACHE_MAX_ENTRIES,
+    TOOL_TIMEOUT_SECONDS,
+)
+
+T = TypeVar("T")
+
+# upstream name -> total timeout (seconds)
+UPSTREAM_TIMEOUTS: Dict[str, float] = {
+    "llm": LLM_TIMEOUT_SECONDS,
+    "tools": TOOL_TIMEOUT_SECONDS,
+}
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+class ClientRegistry:
+    """
+    Application-scoped pooled httpx.AsyncClients, one per upstream, so chat
+    turns reuse keep-alive connections instead of dialing (and TLS-handshaking)
+    on every call. Opened in app.lifespan, closed on shutdown.
+    """
+
+    def __init__(self) -> None:
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _build(self, upstream: str) -> httpx.AsyncClient:
+        total = UPSTREAM_TIMEOUTS[upstream]
+        http2 = HTTP2_ENABLED and _http2_available()
+        if HTTP2_ENABLED and not http2:
+            print("[HTTP] HTTP2_ENABLED is set but the 'h2' package is missing; using HTTP/1.1")
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(total, connect=min(HTTP_CONNECT_TIMEOUT_SECONDS, total)),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            http2=http2,
+        )
+
+    def start(self) -> None:
+        for upstream in UPSTREAM_TIMEOUTS:
+            self.get(upstream)
+
+    def get(self, upstream: str) -> httpx.AsyncClient:
+        """Client for `upstream`; created on first use so scripts outside the app still work."""
+        client = self._clients.get(upstream)
+        if client is None or client.is_closed:
+            client = self._clients[upstream] = self._build(upstream)
+        return client
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+
+clients = ClientRegistry()
+
+
+def get_client(upstream: str) -> httpx.AsyncClient:
+    return clients.get(upstream)
+
+
+class ConditionalCache:
+    """
+    Client-side cache of ETagged GET responses, stored already parsed. Each
+    get() revalidates with If-None-Match; on 304 the parsed value is reused,
+    so an unchanged response costs a round trip with an empty body and no
+    JSON parsing or model validation.
+    """
+
+    def __init__(self, max_entries: int = TOOL_CLIENT_CACHE_MAX_ENTRIES):
+        self._cache: LRUCache[Hashable, Tuple[str, Any]] = LRUCache(max_size=max_entries)
+        self.requests = 0
+        self.not_modified = 0
+        self.stores = 0
+
+    async def get(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        params: Mapping[str, Any],
+        parse: Callable[[httpx.Response], T],
+    ) -> T:
+        self.requests += 1
+        key = (url, tuple(sorted((k, str(v)) for k, v in params.items())))
+        cached: Optional[Tuple[str, Any]] = self._cache.get(key)
+        headers = {"If-None-Match": cached[0]} if cached is not None else None
+        r = await client.get(url, params=params, headers=headers)
+        if r.status_code == 304 and cached is not None:
+            self.not_modified += 1
+            return cached[1]
+        r.raise_for_status()
+        value = parse(r)
+        etag = r.headers.get("ETag")
+        if etag:
+            self._cache.put(key, (etag, value))
+            self.stores += 1
+        return value
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        base = self._cache.stats()
+        return {
+            "size": base["size"],
+            "max_size": base["max_size"],
+            "requests": self.requests,
+            "not_modified": self.not_modified,
+            "revalidated_rate": round(self.not_modified / self.requests, 4) if self.requests else 0.0,
+            "stores": self.stores,
+            "evictions": base["evictions"],
+        }
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+
+class StreamingJsonObject:
+    """
+    Incremental scanner for the first top-level JSON object in streamed text.
+
+    feed() takes text chunks as they arrive and returns the parsed object as
+    soon as it can: either when the top-level object closes, or once the
+    values of all `required_keys` are complete, in which case the prefix
+    seen so far is closed off and parsed (later keys are dropped). With no
+    required keys it waits for the close. Text before the first "{" and
+    after the result is ignored. Each character is looked at once.
+    """
+
+    def __init__(self, required_keys: Iterable[str] = ()):
+        self.required_keys = frozenset(required_keys)
+        self._done: Set[str] = set()   # top-level keys whose value is complete
+        self._parts: List[str] = []
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string: List[str] = []   # current string at depth 1 (possible key)
+        self._last_string: Optional[str] = None
+        self._key: Optional[str] = None
+        self._length = 0
+        self.chars = 0   # total text fed, including any preamble
+        self.result: Optional[Dict[str, Any]] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        if self.result is not None or not chunk:
+            return self.result
+        self.chars += len(chunk)
+        if not self._started:
+            i = chunk.find("{")
+            if i < 0:
+                return None
+            chunk = chunk[i:]
+            self._started = True
+        offset = self._length
+        self._parts.append(chunk)
+        self._length += len(chunk)
+        for pos, ch in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = "".join(self._string)
+                    continue
+                if self._depth == 1:
+                    self._string.append(ch)
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._string = []
+            elif ch == ":" and self._depth == 1:
+                self._key, self._last_string = self._last_string, None
+            elif ch == "," and self._depth == 1:
+                if self._value_done(offset + pos):
+                    return self.result
+                self._key = None
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                end = offset + pos + 1
+                if self._depth == 0:
+                    obj = self._parse(end, "")
+                    if obj is None:
+                        raise ValueError("Malformed JSON object in LLM stream")
+                    return obj
+                if self._depth == 1 and self._value_done(end):
+                    return self.result
+        return None
+
+    def _value_done(self, end: int) -> bool:
+        """Record that the current top-level key's value ended at `end`; True if that made the result."""
+        if self._key is None or not self.required_keys:
+            return False
+        self._done.add(self._key)
+        if not self.required_keys <= self._done:
+            return False
+        # Everything the caller needs is in; close the top-level object ourselves.
+        # If that doesn't parse (e.g. a dangling comma), keep reading to the real end.
+        return self._parse(end, "}") is not None
+
+    def _parse(self, end: int, closer: str) -> Optional[Dict[str, Any]]:
+        try:
+            obj = json.loads(self.text[:end] + closer)
+        except ValueError:
+            return None
+        if not isinstance(obj, dict):
+            return None
+        self.result = obj
+        return obj
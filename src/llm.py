@@ -1,65 +1,179 @@
+import json
 import re
-from typing import Any
-import httpx
-from src.config import OLLAMA_MODEL, OLLAMA_URL
+from typing import Any, Dict, Optional
+from src.config import (
+    LLM_BATCH_MAX_SIZE,
+    LLM_BATCH_WINDOW_MS,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_QUEUE,
+    LLM_QUEUE_TIMEOUT_SECONDS,
+    LLM_STREAMING,
+    OLLAMA_MODEL,
+    OLLAMA_URL,
+)
+from src.http_clients import get_client
+from src.json_stream import StreamingJsonObject
+from src.llm_gate import ConcurrencyLimiter, MicroBatcher, SingleFlight
 from src.schemas import QuerySpec
+from src.spec_cache import normalize
+
+# Identical in-flight compilations share one upstream call; all calls share the Ollama slots
+_flights: SingleFlight[QuerySpec] = SingleFlight()
+_limiter = ConcurrencyLimiter(LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT_SECONDS)
+_batcher: Optional[MicroBatcher[QuerySpec]] = None
+
+
+def configure_batching(window_ms: float, max_batch: int = LLM_BATCH_MAX_SIZE) -> None:
+        """Turn micro-batching on (window_ms > 0) or off; LLM_BATCH_WINDOW_MS sets it at startup."""
+        global _batcher
+        if window_ms <= 0:
+            _batcher = None
+            return
+        _batcher = MicroBatcher(
+            window_ms / 1e3,
+            max_batch,
+            max_waves=max(1, LLM_MAX_CONCURRENCY // max(1, max_batch)),
+            max_queue=LLM_MAX_QUEUE,
+            timeout_seconds=LLM_QUEUE_TIMEOUT_SECONDS,
+        )
+
+
+configure_batching(LLM_BATCH_WINDOW_MS)
+
 
 async def query_spec_call_llm(system_prompt: str, user_message: str) -> QuerySpec:
-        async with httpx.AsyncClient(timeout=120) as client:
-            payload: dict[str, Any] = {
-                "model": OLLAMA_MODEL,
-                "stream": False,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message},
-                ],
-                "format": "json",
-            }
-            r = await client.post(OLLAMA_URL, json=payload)
+        key = (system_prompt, normalize(user_message)[0])
+        spec = await _flights.do(key, lambda: _call_batched(system_prompt, user_message))
+        # Callers post-process their spec; don't hand the same object to all of them
+        return spec.model_copy(deep=True)
+
+
+def llm_stats() -> Dict[str, Any]:
+        return {
+            "single_flight": _flights.stats(),
+            "limiter": _limiter.stats(),
+            "batching": _batcher.stats() if _batcher is not None else None,
+        }
+
+
+async def _call_batched(system_prompt: str, user_message: str) -> QuerySpec:
+        if _batcher is None:
+            return await _call_limited(system_prompt, user_message)
+        return await _batcher.submit(lambda: _call_limited(system_prompt, user_message))
+
+
+async def _call_limited(system_prompt: str, user_message: str) -> QuerySpec:
+        async with _limiter:
+            return await _call_llm(system_prompt, user_message)
+
+
+async def _call_llm(system_prompt: str, user_message: str) -> QuerySpec:
+        payload: dict[str, Any] = {
+            "model": OLLAMA_MODEL,
+            "stream": LLM_STREAMING,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_message},
+            ],
+            "format": "json",
+        }
+        if LLM_STREAMING:
+            response_data = await _stream_json(payload)
+        else:
+            response_data = await _complete_json(payload)
+        print(f"DEBUG - LLM raw JSON response:\n{json.dumps(response_data, indent=2)}")
+        return _to_query_spec(response_data)
+
+
+async def _complete_json(payload: Dict[str, Any]) -> Dict[str, Any]:
+        client = get_client("llm")
+        r = await client.post(OLLAMA_URL, json=payload)
+        r.raise_for_status()
+        response_json = r.json()
+
+        # Handle both Ollama native API and OpenAI-compatible API formats
+        if "choices" in response_json:
+            # OpenAI-compatible format: /v1/chat/completions
+            content = response_json["choices"][0]["message"]["content"]
+        else:
+            # Ollama native format: /api/chat
+            content = response_json["message"]["content"]
+
+        m = re.search(r"\{.*\}", content, flags=re.S)
+        if not m:
+            raise ValueError("No JSON found in Ollama output")
+
+        return json.loads(m.group(0))
+
+
+def _delta_content(line: str) -> Optional[str]:
+        """Text carried by one line of a streamed completion, or None for keep-alives / end markers."""
+        line = line.strip()
+        if not line:
+            return None
+        # OpenAI-compatible format streams SSE: "data: {...}" ... "data: [DONE]"
+        if line.startswith("data:"):
+            line = line[5:].strip()
+            if line == "[DONE]":
+                return None
+        elif line.startswith(":"):
+            return None
+        chunk = json.loads(line)
+        if "choices" in chunk:
+            choices = chunk["choices"]
+            return (choices[0].get("delta") or {}).get("content") if choices else None
+        # Ollama native format streams NDJSON: {"message": {"content": ...}, "done": false}
+        return (chunk.get("message") or {}).get("content")
+
+
+async def _stream_json(payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Read the completion as it is generated and stop as soon as the JSON
+        object (or the members _to_query_spec reads) is complete. Leaving the
+        stream early closes the connection, which makes Ollama abort the generation.
+        """
+        client = get_client("llm")
+        scanner = StreamingJsonObject(required_keys=("is_banking_domain", "query"))
+        async with client.stream("POST", OLLAMA_URL, json=payload) as r:
             r.raise_for_status()
-            response_json = r.json()
-            
-            # Handle both Ollama native API and OpenAI-compatible API formats
-            if "choices" in response_json:
-                # OpenAI-compatible format: /v1/chat/completions
-                content = response_json["choices"][0]["message"]["content"]
-            else:
-                # Ollama native format: /api/chat
-                content = response_json["message"]["content"]
-            
-            m = re.search(r"\{.*\}", content, flags=re.S)
-            if not m:
-                raise ValueError("No JSON found in Ollama output")
-            
-            import json
-            response_data = json.loads(m.group(0))
-            print(f"DEBUG - LLM raw JSON response:\n{json.dumps(response_data, indent=2)}")
-            
-            # Extract the nested query structure
-            query_data = response_data.get("query", {})
-            
-            # Merge is_banking_domain from top level
-            query_data["is_banking_domain"] = response_data.get("is_banking_domain")
-            
-            # Fix TimeRange - must update query_data dict directly
-            time_range = query_data.get("time_range")
-            if time_range is not None:  # Only process if time_range is provided
-                if time_range.get("mode") == "relative" and (not time_range.get("last") or not time_range.get("unit")):
-                    # Set defaults for relative mode
-                    time_range["last"] = 180
-                    time_range["unit"] = "days"
-                    query_data["time_range"] = time_range  # Update the dict
-            
-            # Fix params if it's a string instead of dict
-            if isinstance(query_data.get("params"), str):
-                try:
-                    query_data["params"] = json.loads(query_data["params"])
-                except:
-                    query_data["params"] = {}
-            
-            print(f"DEBUG - query_data before validation:\n{json.dumps(query_data, indent=2)}")
+            async for line in r.aiter_lines():
+                content = _delta_content(line)
+                if content and scanner.feed(content) is not None:
+                    print(f"[LLM] JSON complete after {scanner.chars} chars; closing stream")
+                    return scanner.result  # type: ignore[return-value]
+        # Stream ended without a complete object; try the whole text like the non-streaming path
+        m = re.search(r"\{.*\}", scanner.text, flags=re.S)
+        if not m:
+            raise ValueError("No JSON found in Ollama output")
+        return json.loads(m.group(0))
+
+
+def _to_query_spec(response_data: Dict[str, Any]) -> QuerySpec:
+        # Extract the nested query structure
+        query_data = response_data.get("query", {})
+
+        # Merge is_banking_domain from top level
+        query_data["is_banking_domain"] = response_data.get("is_banking_domain")
+
+        # Fix TimeRange - must update query_data dict directly
+        time_range = query_data.get("time_range")
+        if time_range is not None:  # Only process if time_range is provided
+            if time_range.get("mode") == "relative" and (not time_range.get("last") or not time_range.get("unit")):
+                # Set defaults for relative mode
+                time_range["last"] = 180
+                time_range["unit"] = "days"
+                query_data["time_range"] = time_range  # Update the dict
+
+        # Fix params if it's a string instead of dict
+        if isinstance(query_data.get("params"), str):
             try:
-                return QuerySpec.model_validate(query_data)
-            except Exception as validation_error:
-                print(f"DEBUG - QuerySpec validation failed: {validation_error}")
-                raise
\ No newline at end of file
+                query_data["params"] = json.loads(query_data["params"])
+            except:
+                query_data["params"] = {}
+
+        print(f"DEBUG - query_data before validation:\n{json.dumps(query_data, indent=2)}")
+        try:
+            return QuerySpec.model_validate(query_data)
+        except Exception as validation_error:
+            print(f"DEBUG - QuerySpec validation failed: {validation_error}")
+            raise
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Set, Tuple, TypeVar
+
+from src.metrics import LatencyHistogram
+
+T = TypeVar("T")
+
+# Queue waits are short when healthy; finer buckets at the low end than the request histograms
+WAIT_BUCKETS_MS = (0.1, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class LLMOverloaded(RuntimeError):
+    """The LLM queue is full or a caller waited too long for a slot."""
+
+
+class SingleFlight(Generic[T]):
+    """
+    Concurrent calls with the same key share one in-flight call. The call
+    runs as its own task, so a caller that gives up (client disconnect)
+    doesn't cancel it for the others waiting on the same key.
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[Hashable, "asyncio.Task[T]"] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        task = self._flights.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda _t, k=key: self._flights.pop(k, None))
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight_keys": len(self._flights),
+        }
+
+
+class ConcurrencyLimiter:
+    """
+    At most `max_concurrency` holders at a time; up to `max_queue` callers
+    wait (FIFO) for a slot, each for at most `timeout_seconds`. Anything
+    beyond that raises LLMOverloaded instead of piling onto the upstream.
+
+        async with limiter:
+            ...
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, timeout_seconds: Optional[float]):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.timeout_seconds = timeout_seconds if timeout_seconds and timeout_seconds > 0 else None
+        self._sem = asyncio.Semaphore(self.max_concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.wait_latency = LatencyHistogram(WAIT_BUCKETS_MS)
+
+    async def __aenter__(self) -> "ConcurrencyLimiter":
+        if not self._sem.locked():
+            # Free slot: acquire() returns without suspending, so the count is exact
+            await self._sem.acquire()
+            self.wait_latency.observe(0.0)
+            self.active += 1
+            self.admitted += 1
+            return self
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise LLMOverloaded(f"LLM queue full ({self.waiting} waiting)")
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._sem.acquire(), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LLMOverloaded(f"Waited over {self.timeout_seconds:g}s for an LLM slot") from None
+        finally:
+            self.waiting -= 1
+            self.wait_latency.observe(time.perf_counter() - t0)
+        self.active += 1
+        self.admitted += 1
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        self.active -= 1
+        self._sem.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "timeout_seconds": self.timeout_seconds,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected,
+            "timed_out": self.timeouts,
+            "wait": self.wait_latency.snapshot(),
+        }
+
+
+class MicroBatcher(Generic[T]):
+    """
+    Holds submitted calls for up to `window_seconds` (or until `max_batch`
+    are waiting) and then starts them together, so they reach Ollama as one
+    wave it can schedule into its parallel slots in a single batch rather
+    than trickling in behind each other. At most `max_waves` waves run at
+    once; calls arriving meanwhile form the next wave, which leaves as soon
+    as a running one finishes. Size max_batch to OLLAMA_NUM_PARALLEL.
+
+    Like ConcurrencyLimiter, at most `max_queue` calls wait, each for at
+    most `timeout_seconds`, before LLMOverloaded is raised.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float,
+        max_batch: int,
+        max_waves: int = 1,
+        max_queue: int = 64,
+        timeout_seconds: Optional[float] = None,
+    ):
+        self.window_seconds = window_seconds
+        self.max_batch = max(1, max_batch)
+        self.max_waves = max(1, max_waves)
+        self.max_queue = max(self.max_batch, max_queue)
+        self.timeout_seconds = timeout_seconds if timeout_seconds and timeout_seconds > 0 else None
+        self._pending: List[Tuple[Callable[[], Awaitable[T]], "asyncio.Future[T]"]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: Set["asyncio.Task[None]"] = set()   # the loop only holds weak refs to tasks
+        self.batches = 0
+        self.items = 0
+        self.full_flushes = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.sizes: Dict[int, int] = {}
+
+    async def submit(self, fn: Callable[[], Awaitable[T]]) -> T:
+        if len(self._pending) >= self.max_queue:
+            self.rejected += 1
+            raise LLMOverloaded(f"LLM batch queue full ({len(self._pending)} waiting)")
+        loop = asyncio.get_running_loop()
+        fut: "asyncio.Future[T]" = loop.create_future()
+        self._pending.append((fn, fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush(full=True)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+        try:
+            return await asyncio.wait_for(fut, self.timeout_seconds)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LLMOverloaded(f"Waited over {self.timeout_seconds:g}s for an LLM batch") from None
+
+    def _flush(self, full: bool = False) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if len(self._running) >= self.max_waves:
+            return  # picked up when a running wave finishes
+        # Callers that timed out or went away are dropped before they cost an upstream call
+        self._pending = [(fn, fut) for fn, fut in self._pending if not fut.done()]
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if not batch:
+            return
+        self.batches += 1
+        self.items += len(batch)
+        self.full_flushes += full
+        self.sizes[len(batch)] = self.sizes.get(len(batch), 0) + 1
+        task = asyncio.ensure_future(self._run(batch))
+        self._running.add(task)
+        task.add_done_callback(self._wave_done)
+
+    def _wave_done(self, task: "asyncio.Task[None]") -> None:
+        self._running.discard(task)
+        if self._pending:
+            # These waited at least one wave already; don't add the window on top
+            self._flush(full=len(self._pending) >= self.max_batch)
+
+    async def _run(self, batch: List[Tuple[Callable[[], Awaitable[T]], "asyncio.Future[T]"]]) -> None:
+        results = await asyncio.gather(*(fn() for fn, _ in batch), return_exceptions=True)
+        for (_, fut), result in zip(batch, results):
+            if fut.done():  # caller went away
+                continue
+            if isinstance(result, BaseException):
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": round(self.window_seconds * 1e3, 3),
+            "max_batch": self.max_batch,
+            "max_waves": self.max_waves,
+            "queue_depth": len(self._pending),
+            "waves_running": len(self._running),
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 3) if self.batches else 0.0,
+            "full_flushes": self.full_flushes,
+            "rejected_queue_full": self.rejected,
+            "timed_out": self.timeouts,
+            "batch_sizes": {str(k): v for k, v in sorted(self.sizes.items())},
+        }
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, Optional, Tuple, cast
+
+from src.schemas import TimeRange, TimeUnit
+
+# Every keyword the rules engine and the LLM post-processing look for
+KEYWORDS = (
+    # greetings / small talk
+    "hello", "hi", "hey", "good morning", "good afternoon", "good evening", "thanks", "thank you",
+    # banking vocabulary
+    "transaction", "spend", "spending", "payment", "money", "balance", "charge", "subscription", "bill",
+    "account", "checking", "savings", "how much money", "have", "do i",
+    # intents
+    "don't recognize", "dont recognize", "unrecognized", "what is this",
+    "recurring", "top", "biggest", "most", "where", "spending categor",
+    # periods
+    "ytd", "year to date", "this year", "this month", "last month", "last week",
+)
+
+_UNIT = r"(?:days?|weeks?|months?|years?)"
+
+
+def _trie_pattern(words: Tuple[str, ...]) -> str:
+    """
+    Regex alternation for `words` factored into a prefix trie, so the engine
+    walks shared prefixes once; optional tails keep the longest match.
+    """
+    trie: Dict[str, dict] = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+_KEYWORDS_RE = _trie_pattern(KEYWORDS)
+
+# One pass over the message. Only word starts where some signal can begin
+# are visited; there, a set of optional lookaheads records every signal that
+# starts at that position. The keyword group keeps the longest keyword; the
+# shorter keywords it starts with are added back via _PREFIXES.
+_SCAN = re.compile(
+    r"\b(?=" + _KEYWORDS_RE + r"|\d|t\d{3}\b|last|past|previous|give|show|recent|my|need|want|" + _UNIT + r"\b)"
+    r"(?=(" + _KEYWORDS_RE + r"))?"
+    r"(?=(?:last|past|previous)\s+(\d+)\s+(" + _UNIT + r")\b)?"
+    r"(?=(?:give\s+me|show\s+me|show|last|recent|my|need|want)\s+(\d+)\s+transactions?\b)?"
+    r"(?=(\d+)\s+transactions?\b)?"
+    r"(?=(t\d{3})\b)?"
+    r"(?=(" + _UNIT + r")\b)?"
+)
+
+_PREFIXES: Dict[str, FrozenSet[str]] = {
+    k: frozenset(other for other in KEYWORDS if k.startswith(other)) for k in KEYWORDS
+}
+
+_UNITS: Dict[str, str] = {
+    "day": "days", "days": "days",
+    "week": "weeks", "weeks": "weeks",
+    "month": "months", "months": "months",
+    "year": "years", "years": "years",
+}
+
+
+@dataclass(frozen=True)
+class Signals:
+    """Everything the rules look for in a (lowercased) message, found in one scan."""
+    words: FrozenSet[str]
+    relative: Optional[Tuple[int, str]]   # first "last/past/previous N <unit>", unit normalized
+    limit: Optional[int]                  # "show me N transactions" style count, else bare "N transactions"
+    tx_id: Optional[str]
+    has_time_unit: bool
+
+    def has(self, *keywords: str) -> bool:
+        return not self.words.isdisjoint(keywords)
+
+
+@lru_cache(maxsize=2048)
+def scan(text: str) -> Signals:
+    """
+    Extract intent keywords, period, count limit and tx id from lowercased text.
+    Keywords match at word starts ("spend" in "spending", but not "hi" in "this").
+    """
+    words: set = set()
+    relative: Optional[Tuple[int, str]] = None
+    lim_verb: Optional[int] = None
+    lim: Optional[int] = None
+    tx_id: Optional[str] = None
+    has_unit = False
+    # findall yields one tuple of groups per visited position, without match objects
+    for kw, rel_n, rel_unit, verb_n, lim_n, tx, unit in _SCAN.findall(text):
+        if kw:
+            words |= _PREFIXES[kw]
+        if rel_n and relative is None:
+            relative = (int(rel_n), _UNITS[rel_unit])
+        if verb_n and lim_verb is None:
+            lim_verb = int(verb_n)
+        if lim_n and lim is None:
+            lim = int(lim_n)
+        if tx and tx_id is None:
+            tx_id = tx
+        if unit:
+            has_unit = True
+    return Signals(
+        words=frozenset(words),
+        relative=relative,
+        limit=lim_verb if lim_verb is not None else lim,
+        tx_id=tx_id,
+        has_time_unit=has_unit,
+    )
+
+
+def time_range_from(sig: Signals) -> Optional[TimeRange]:
+    if sig.has("this year", "ytd", "year to date"):
+        return TimeRange(mode="preset", preset="ytd")
+    if sig.has("this month"):
+        return TimeRange(mode="preset", preset="this_month")
+    if sig.has("last month"):
+        return TimeRange(mode="preset", preset="last_month")
+    # Handle "last week" without a number
+    if sig.has("last week"):
+        return TimeRange(mode="relative", last=1, unit=cast(TimeUnit, "weeks"))
+    if sig.relative is None:
+        return None
+    n, unit = sig.relative
+    return TimeRange(mode="relative", last=n, unit=cast(TimeUnit, unit))
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence
+
+# Upper bounds in milliseconds; the last bucket catches everything slower
+DEFAULT_BUCKETS_MS: Sequence[float] = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with approximate percentiles."""
+
+    def __init__(self, buckets_ms: Sequence[float] = DEFAULT_BUCKETS_MS):
+        self.buckets_ms: List[float] = list(buckets_ms)
+        self._counts: List[int] = [0] * (len(self.buckets_ms) + 1)
+        self._sum_ms = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1e3
+        with self._lock:
+            self._counts[bisect_left(self.buckets_ms, ms)] += 1
+            self._sum_ms += ms
+            self._count += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Upper bound (ms) of the bucket holding the p-th percentile; None if it's the overflow bucket."""
+        if not self._count:
+            return 0.0
+        target = p / 100 * self._count
+        seen = 0
+        for i, n in enumerate(self._counts):
+            seen += n
+            if seen >= target:
+                return self.buckets_ms[i] if i < len(self.buckets_ms) else None
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self._counts)
+            total, sum_ms = self._count, self._sum_ms
+        labels = [f"le_{b:g}ms" for b in self.buckets_ms] + ["overflow"]
+        return {
+            "count": total,
+            "mean_ms": round(sum_ms / total, 3) if total else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "buckets": dict(zip(labels, counts)),
+        }
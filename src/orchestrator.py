@@ -1,7 +1,6 @@
-from typing import List
-import httpx
+from datetime import date
+from typing import List, Optional
 
-from src.config import TOOL_BASE_URL
 from src.compute import (
     handle_recurring_payments,
     handle_top_spending_ytd,
@@ -9,30 +8,23 @@ from src.compute import (
     handle_unrecognized_transaction,
     resolve_time_range
 )
+from src.config import PREFETCH_ENABLED
+from src.prefetch import SpeculativeFetch
 from src.query_spec_builder import compile_queryspec
 from src.schemas import ChatRequest, ChatResponse, Transaction, UIMessage, UISpec
+from src.tool_backend import get_tool_backend
 
 # ----------------------------
 # Tool calls
 # ----------------------------
 
-async def tool_get_transactions(account_id: str, start: str, end: str) -> List[Transaction]:
-    """Fetch transactions from the tool API."""
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.get(f"{TOOL_BASE_URL}/tool/transactions", params={
-            "accountId": account_id,
-            "start": start,
-            "end": end,
-        })
-        r.raise_for_status()
-        return [Transaction.model_validate(x) for x in r.json()]
+async def tool_get_transactions(account_id: str, start: str, end: str, limit: Optional[int] = None) -> List[Transaction]:
+    """Fetch the newest `limit` transactions in the range through the configured tool backend."""
+    return await get_tool_backend().get_transactions(account_id, date.fromisoformat(start), date.fromisoformat(end), limit)
 
 async def tool_get_transaction_by_id(account_id: str, tx_id: str) -> Transaction:
-    """Fetch a single transaction by ID from the tool API."""
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.get(f"{TOOL_BASE_URL}/tool/transactions/{tx_id}", params={"accountId": account_id})
-        r.raise_for_status()
-        return Transaction.model_validate(r.json())
+    """Fetch a single transaction by ID through the configured tool backend."""
+    return await get_tool_backend().get_transaction_by_id(account_id, tx_id)
 
 # ----------------------------
 # Orchestration logic
@@ -47,10 +39,23 @@ async def orchestrate_chat(req: ChatRequest) -> ChatResponse:
     2. Validate it's a banking domain query
     3. Route based on intent:
        - unrecognized_transaction: needs tx_id
-       - others: fetch transactions and compute UI
+       - others: fetch data from the tool backend (raw rows, or precomputed
+         rollup / recurring state when running in-process) and compute UI
     4. Return ChatResponse with UI specification
+
+    When the compile has to ask the LLM, the data for the rules guess is
+    fetched meanwhile (PREFETCH_ENABLED) and reused in step 3 if it fits.
     """
-    q = await compile_queryspec(req.message, req.context)
+    prefetch = SpeculativeFetch(get_tool_backend(), req.accountId) if PREFETCH_ENABLED else None
+    try:
+        return await _orchestrate(req, prefetch)
+    finally:
+        if prefetch is not None:
+            prefetch.discard()
+
+
+async def _orchestrate(req: ChatRequest, prefetch: Optional[SpeculativeFetch]) -> ChatResponse:
+    q = await compile_queryspec(req.message, req.context, on_guess=prefetch.start if prefetch else None)
     
     # Treat is_banking_domain=null or false as non-banking queries
     if q.is_banking_domain is False or q.is_banking_domain is None:
@@ -86,14 +91,18 @@ async def orchestrate_chat(req: ChatRequest) -> ChatResponse:
     # 3) For the other intents: pull transactions for a single resolved range
     limit_only = q.params.get("limit_only", False)
     start_d, end_d = resolve_time_range(q.time_range, limit_only=limit_only)
-    txs = await tool_get_transactions(req.accountId, start_d.isoformat(), end_d.isoformat())
+    backend = get_tool_backend()
+    # The list view shows at most `limit` rows: fetch only those
+    limit = int(q.params.get("limit", 50)) if q.intent == "transactions_list" else None
+    data = await prefetch.take(q.intent, start_d, end_d, limit) if prefetch is not None else None
 
     if q.intent == "transactions_list":
+        txs = data if data is not None else await tool_get_transactions(req.accountId, start_d.isoformat(), end_d.isoformat(), limit)
         ui = handle_transactions_list(q, txs)
     elif q.intent == "top_spending_ytd":
-        ui = handle_top_spending_ytd(q, txs)
+        ui = handle_top_spending_ytd(q, data if data is not None else await backend.spending(req.accountId, start_d, end_d))
     elif q.intent == "recurring_payments":
-        ui = handle_recurring_payments(q, txs)
+        ui = handle_recurring_payments(q, data if data is not None else await backend.recurring(req.accountId, start_d, end_d))
     else:
         ui = UISpec(messages=[UIMessage(
             content="I didn't understand that request. Try: top spendings this year, last 30 days transactions, recurring subscriptions, or dispute a transaction."
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
+from src.compute import resolve_time_range
+from src.recurring import RecurringWindow
+from src.schemas import QuerySpec
+from src.tool_backend import ToolBackend
+
+# intent -> backend call the orchestrator makes for it
+_FETCHES: Dict[str, str] = {
+    "transactions_list": "get_transactions",
+    "top_spending_ytd": "spending",
+    "recurring_payments": "recurring",
+}
+
+_STATS: Dict[str, int] = {
+    "started": 0,   # guesses that launched a fetch
+    "skipped": 0,   # guesses with nothing to fetch (balance, dispute, non-banking)
+    "hits": 0,      # same call and range: used as-is
+    "trimmed": 0,   # same call, wider range: narrowed to the final range
+    "misses": 0,    # different call or unusable range: fetched again
+    "errors": 0,    # the speculative fetch itself failed
+    "wasted": 0,    # final intent needed no fetch; cancelled
+}
+
+
+class SpeculativeFetch:
+    """
+    One chat turn's data fetch, started from the rules guess while the LLM
+    is still compiling, so the turn costs max(LLM, fetch) instead of the sum.
+    take() hands the result over when the final QuerySpec agrees with the
+    guess (or can be served by narrowing it); otherwise the caller fetches.
+    """
+
+    def __init__(self, backend: ToolBackend, account_id: str):
+        self.backend = backend
+        self.account_id = account_id
+        self._task: Optional[asyncio.Task] = None
+        self._call: Optional[str] = None
+        self._range: Optional[Tuple[date, date]] = None
+        self._limit: Optional[int] = None
+
+    def start(self, guess: QuerySpec) -> None:
+        call = _FETCHES.get(guess.intent)
+        if not guess.is_banking_domain or call is None or self._task is not None:
+            _STATS["skipped"] += 1
+            return
+        start_d, end_d = resolve_time_range(guess.time_range, limit_only=guess.params.get("limit_only", False))
+        self._call, self._range = call, (start_d, end_d)
+        if call == "get_transactions":
+            self._limit = int(guess.params.get("limit", 50))
+            fetch = self.backend.get_transactions(self.account_id, start_d, end_d, self._limit)
+        else:
+            fetch = getattr(self.backend, call)(self.account_id, start_d, end_d)
+        self._task = asyncio.ensure_future(fetch)
+        _STATS["started"] += 1
+        print(f"[PREFETCH] {call} {start_d}..{end_d} while the LLM compiles")
+
+    async def take(self, intent: str, start: date, end: date, limit: Optional[int] = None) -> Optional[Any]:
+        """Prefetched data for this intent, range and row limit, or None to fetch normally."""
+        task, self._task = self._task, None
+        if task is None:
+            return None
+        if _FETCHES.get(intent) != self._call:
+            _drop(task)
+            _STATS["misses"] += 1
+            return None
+        try:
+            data = await task
+        except Exception as e:
+            print(f"[PREFETCH] Speculative fetch failed: {e}")
+            _STATS["errors"] += 1
+            return None
+        assert self._range is not None
+        pre_start, pre_end = self._range
+        if isinstance(data, RecurringWindow):
+            # Detector state covers the whole account; only the window changes
+            _STATS["hits" if self._range == (start, end) else "trimmed"] += 1
+            return data if self._range == (start, end) else data.detector.window(start, end)
+        if not isinstance(data, list):
+            if self._range == (start, end):
+                _STATS["hits"] += 1
+                return data
+            _STATS["misses"] += 1
+            return None
+        if pre_end == end and pre_start <= start:
+            # Rows come newest first from the same end date, so the rows of the
+            # narrower range are a prefix of these. It is complete unless the
+            # prefetch was cut off by its own limit inside that prefix.
+            rows = [tx for tx in data if tx.postedAt.date() >= start]
+            truncated = self._limit is not None and len(data) >= self._limit and len(rows) == len(data)
+            if not truncated or (limit is not None and len(rows) >= limit):
+                _STATS["hits" if self._range == (start, end) and len(rows) == len(data) else "trimmed"] += 1
+                return rows if limit is None else rows[:limit]
+        _STATS["misses"] += 1
+        return None
+
+    def discard(self) -> None:
+        """Cancel a fetch nobody took (turn ended without needing it)."""
+        task, self._task = self._task, None
+        if task is not None:
+            _drop(task)
+            _STATS["wasted"] += 1
+
+
+def _drop(task: asyncio.Task) -> None:
+    task.cancel()
+    # If it already failed, retrieve the error so asyncio doesn't log it as unhandled
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+def prefetch_stats() -> Dict[str, Any]:
+    used = _STATS["hits"] + _STATS["trimmed"]
+    return {
+        **_STATS,
+        "hit_rate": round(used / _STATS["started"], 4) if _STATS["started"] else 0.0,
+    }
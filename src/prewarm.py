@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from src import access_log, mock_store
+from src.config import PREWARM_ACCOUNTS, PREWARM_CONCURRENCY, PREWARM_TOP_N, STORE_CACHE_MAX_ACCOUNTS
+
+
+def hot_accounts() -> List[str]:
+    """PREWARM_ACCOUNTS, then the access log's top PREWARM_TOP_N, without repeats or more than the cache holds."""
+    accounts = list(dict.fromkeys(PREWARM_ACCOUNTS + access_log.top(PREWARM_TOP_N)))
+    if len(accounts) > STORE_CACHE_MAX_ACCOUNTS:
+        # Warming past the cache's capacity would only evict what was just warmed
+        print(f"[PREWARM] {len(accounts)} hot accounts but STORE_CACHE_MAX_ACCOUNTS={STORE_CACHE_MAX_ACCOUNTS}; warming the first {STORE_CACHE_MAX_ACCOUNTS}")
+        accounts = accounts[:STORE_CACHE_MAX_ACCOUNTS]
+    return accounts
+
+
+class Prewarmer:
+    """
+    Loads and indexes the hot accounts in worker threads after startup, so
+    their first request doesn't pay for parsing and index building. Runs
+    beside the app rather than before it: /health answers straight away,
+    and GET /ready reports ready once every account has been tried.
+    """
+
+    def __init__(self) -> None:
+        self.accounts: Dict[str, Dict[str, Any]] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.finished_at is not None
+
+    async def run(self, accounts: Optional[List[str]] = None) -> None:
+        self.started_at = time.monotonic()
+        if accounts is None:
+            accounts = await asyncio.to_thread(hot_accounts)
+        self.accounts = {a: {"status": "pending"} for a in accounts}
+        if accounts:
+            print(f"[PREWARM] Warming {len(accounts)} accounts: {', '.join(accounts)}")
+        slots = asyncio.Semaphore(max(1, PREWARM_CONCURRENCY))
+
+        async def warm(account_id: str) -> None:
+            async with slots:
+                state = self.accounts[account_id]
+                state["status"] = "loading"
+                t0 = time.perf_counter()
+                try:
+                    rows = await asyncio.to_thread(mock_store.warm_account, account_id)
+                except Exception as e:
+                    # Left for the first request to load (and report) as usual
+                    state.update(status="failed", error=str(e))
+                    print(f"[PREWARM] {account_id}: failed: {e}")
+                    return
+                if rows is None:
+                    state["status"] = "missing"
+                    return
+                state.update(status="warm", rows=rows, ms=round((time.perf_counter() - t0) * 1e3, 1))
+
+        try:
+            await asyncio.gather(*(warm(a) for a in accounts))
+        finally:
+            self.finished_at = time.monotonic()
+        if accounts:
+            print(f"[PREWARM] Done in {self.finished_at - self.started_at:.1f}s: {self._counts()}")
+
+    def _counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for state in self.accounts.values():
+            counts[state["status"]] = counts.get(state["status"], 0) + 1
+        return counts
+
+    def status(self) -> Dict[str, Any]:
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return {
+            "ready": self.ready,
+            "elapsed_s": round(end - self.started_at, 3) if self.started_at is not None else None,
+            "counts": self._counts(),
+            "accounts": self.accounts,
+        }
+
+
+prewarmer = Prewarmer()
@@ -1,212 +1,294 @@
-import re
-from typing import Any, Optional, cast
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
 
-from src.config import OLLAMA_MODEL, OLLAMA_URL
+from src.config import OLLAMA_MODEL, OLLAMA_URL, RULES_CONFIDENCE_THRESHOLD
 from src.llm import query_spec_call_llm
+from src.matcher import scan, time_range_from
 from src.schemas import ConversationContext, QuerySpec, TimeRange
 from src.prompts import QUERY_SPEC_SYSTEM_PROMPT
+from src.metrics import LatencyHistogram
+from src.spec_cache import spec_cache
 
-async def compile_queryspec(message: str, context: Optional[ConversationContext] = None) -> QuerySpec:
+_TIERS = ("cache", "rules", "llm", "fallback")
+_TIER_COUNTS: Dict[str, int] = {tier: 0 for tier in _TIERS}
+_TIER_LATENCY: Dict[str, LatencyHistogram] = {tier: LatencyHistogram() for tier in _TIERS}
+
+async def compile_queryspec(
+    message: str,
+    context: Optional[ConversationContext] = None,
+    on_guess: Optional[Callable[[QuerySpec], None]] = None,
+) -> QuerySpec:
+    """
+    Tiered compile: QuerySpec cache, then the rules engine when it is
+    confident, then the LLM; the rules result doubles as the LLM-failure fallback.
+    on_guess, if given, receives the rules result just before the LLM is
+    called, so callers can start work on the likely answer meanwhile.
+    """
     if not OLLAMA_MODEL or not OLLAMA_URL:
         raise ValueError("OLLAMA_MODEL and OLLAMA_URL must be set")
+    t0 = time.perf_counter()
+    spec, tier = await _compile_tiered(message, context, on_guess)
+    _TIER_COUNTS[tier] += 1
+    _TIER_LATENCY[tier].observe(time.perf_counter() - t0)
+    return spec
+
+
+async def _compile_tiered(
+    message: str,
+    context: Optional[ConversationContext],
+    on_guess: Optional[Callable[[QuerySpec], None]] = None,
+) -> Tuple[QuerySpec, str]:
+    # Common phrasings skip the LLM round trip entirely
+    cached = spec_cache.get(message)
+    if cached is not None:
+        print(f"[QUERY_SPEC] Cache hit for: '{message}'")
+        return cached, "cache"
+
+    rules_spec, confidence = _compile_rules_scored(message, context)
+    if confidence >= RULES_CONFIDENCE_THRESHOLD:
+        print(f"[QUERY_SPEC] Rules fast path (confidence={confidence:.2f}) intent={rules_spec.intent}")
+        if not rules_spec.is_banking_domain:
+            # Greetings carry a placeholder intent; _postprocess would promote them to banking queries
+            return rules_spec, "rules"
+        return _postprocess(rules_spec, message), "rules"
+
+    if on_guess is not None:
+        on_guess(rules_spec)
+
     try:
-        print(f"[QUERY_SPEC] Input message: '{message}'")
+        print(f"[QUERY_SPEC] Input message: '{message}' (rules confidence={confidence:.2f})")
         llm_response = await query_spec_call_llm(QUERY_SPEC_SYSTEM_PROMPT, message)
         print(f"[QUERY_SPEC] LLM returned is_banking_domain={llm_response.is_banking_domain}, intent={llm_response.intent}")
-        
-        # If intent is unrecognized_transaction, always extract transaction ID from message
-        # (Don't rely on context - frontend may not send it properly)
-        if llm_response.intent == "unrecognized_transaction":
-            tx_id = llm_response.params.get("transaction_id")
-            # If LLM didn't extract it, try regex extraction as fallback
-            if not tx_id:
-                tx_id = _extract_tx_id(message.lower())
-                if tx_id:
-                    updated_params: dict[str, Any] = {**llm_response.params, "transaction_id": tx_id}
-                    llm_response = QuerySpec(
-                        is_banking_domain=llm_response.is_banking_domain,
-                        intent=llm_response.intent,
-                        time_range=llm_response.time_range,
-                        params=updated_params
-                    )
-        
-        # Post-processing: Essential fixes only
-        message_lower = message.lower()
-        
-        # Fix -1: Force is_banking_domain=true if intent is a banking intent
-        banking_intents = ["transactions_list", "top_spending_ytd", "recurring_payments", "unrecognized_transaction", "account_balance"]
-        if llm_response.intent in banking_intents and llm_response.is_banking_domain == False:
-            print(f"[FIX] Overriding is_banking_domain=False to True because intent={llm_response.intent}")
-            llm_response = QuerySpec(
-                is_banking_domain=True,  # Override to True
-                intent=llm_response.intent,
-                time_range=llm_response.time_range,
-                params=llm_response.params
-            )
-        
-        # Fix 0: Balance queries - override LLM if it misclassifies
-        is_balance_query = (
-            ("balance" in message_lower and ("account" in message_lower or "checking" in message_lower or "savings" in message_lower)) or
-            ("how much money" in message_lower and ("have" in message_lower or "do i" in message_lower))
+        llm_response = _postprocess(llm_response, message)
+        print(f"[QUERY_SPEC] Final is_banking_domain={llm_response.is_banking_domain}")
+        # Only LLM results are cached; rules results are cheap to recompute
+        spec_cache.put(message, llm_response)
+        return llm_response, "llm"
+    except Exception as e:
+       print(f"[QUERY_SPEC] LLM query spec failed: {e}, falling back to rules-based")
+       return rules_spec, "fallback"
+
+
+def compile_stats() -> Dict[str, Any]:
+    """Per-tier request counts and compile latency histograms."""
+    total = sum(_TIER_COUNTS.values())
+    return {
+        "total": total,
+        "tiers": dict(_TIER_COUNTS),
+        "llm_share": round(_TIER_COUNTS["llm"] / total, 4) if total else 0.0,
+        "latency": {tier: h.snapshot() for tier, h in _TIER_LATENCY.items()},
+    }
+
+
+def _postprocess(llm_response: QuerySpec, message: str) -> QuerySpec:
+    """Fixes applied on top of a compiled QuerySpec (LLM output in particular)."""
+    message_lower = message.lower()
+    sig = scan(message_lower)
+
+    # If intent is unrecognized_transaction, always extract transaction ID from message
+    # (Don't rely on context - frontend may not send it properly)
+    if llm_response.intent == "unrecognized_transaction":
+        tx_id = llm_response.params.get("transaction_id")
+        # If LLM didn't extract it, try regex extraction as fallback
+        if not tx_id:
+            tx_id = sig.tx_id
+            if tx_id:
+                updated_params: dict[str, Any] = {**llm_response.params, "transaction_id": tx_id}
+                llm_response = QuerySpec(
+                    is_banking_domain=llm_response.is_banking_domain,
+                    intent=llm_response.intent,
+                    time_range=llm_response.time_range,
+                    params=updated_params
+                )
+
+    # Post-processing: Essential fixes only
+    # Fix -1: Force is_banking_domain=true if intent is a banking intent
+    banking_intents = ["transactions_list", "top_spending_ytd", "recurring_payments", "unrecognized_transaction", "account_balance"]
+    if llm_response.intent in banking_intents and llm_response.is_banking_domain == False:
+        print(f"[FIX] Overriding is_banking_domain=False to True because intent={llm_response.intent}")
+        llm_response = QuerySpec(
+            is_banking_domain=True,  # Override to True
+            intent=llm_response.intent,
+            time_range=llm_response.time_range,
+            params=llm_response.params
         )
-        if is_balance_query and llm_response.intent != "account_balance":
-            print(f"[QUERY_SPEC] Detected balance query - overriding intent to account_balance")
-            llm_response = QuerySpec(
-                is_banking_domain=True,
-                intent="account_balance",
-                time_range=None,
-                params={}
-            )
-        
-        # Fix 1: Year to date queries should show all transactions
-        if ("year to date" in message_lower or "ytd" in message_lower or "this year" in message_lower):
-            updated_params = {k: v for k, v in llm_response.params.items() if k not in ["limit_only", "limit"]}
-            updated_params["limit"] = 1000
-            llm_response = QuerySpec(
-                is_banking_domain=llm_response.is_banking_domain,
-                intent=llm_response.intent,
-                time_range=TimeRange(mode="preset", preset="ytd"),
-                params=updated_params
-            )
-        
-        # Fix 1b: Clean up preset time ranges (this_month, last_month)
-        # If preset is set, ensure mode="preset" and clear relative fields
-        if llm_response.time_range and llm_response.time_range.preset in ["this_month", "last_month"]:
+    
+    # Fix 0: Balance queries - override LLM if it misclassifies
+    is_balance_query = (
+        (sig.has("balance") and sig.has("account", "checking", "savings")) or
+        (sig.has("how much money") and sig.has("have", "do i"))
+    )
+    if is_balance_query and llm_response.intent != "account_balance":
+        print(f"[QUERY_SPEC] Detected balance query - overriding intent to account_balance")
+        llm_response = QuerySpec(
+            is_banking_domain=True,
+            intent="account_balance",
+            time_range=None,
+            params={}
+        )
+    
+    # Fix 1: Year to date queries should show all transactions
+    if sig.has("year to date", "ytd", "this year"):
+        updated_params = {k: v for k, v in llm_response.params.items() if k not in ["limit_only", "limit"]}
+        updated_params["limit"] = 1000
+        llm_response = QuerySpec(
+            is_banking_domain=llm_response.is_banking_domain,
+            intent=llm_response.intent,
+            time_range=TimeRange(mode="preset", preset="ytd"),
+            params=updated_params
+        )
+    
+    # Fix 1b: Clean up preset time ranges (this_month, last_month)
+    # If preset is set, ensure mode="preset" and clear relative fields
+    if llm_response.time_range and llm_response.time_range.preset in ["this_month", "last_month"]:
+        llm_response = QuerySpec(
+            is_banking_domain=llm_response.is_banking_domain,
+            intent=llm_response.intent,
+            time_range=TimeRange(
+                mode="preset",
+                preset=llm_response.time_range.preset,
+                last=None,
+                unit=None
+            ),
+            params=llm_response.params
+        )
+    
+    # Fix 1c: Force preset mode for "last month" phrase (LLM often misclassifies this)
+    if sig.has("last month") and llm_response.time_range:
+        if llm_response.time_range.mode == "relative" and llm_response.time_range.last == 30 and llm_response.time_range.unit == "days":
+            # LLM incorrectly interpreted "last month" as "last 30 days"
             llm_response = QuerySpec(
                 is_banking_domain=llm_response.is_banking_domain,
                 intent=llm_response.intent,
-                time_range=TimeRange(
-                    mode="preset",
-                    preset=llm_response.time_range.preset,
-                    last=None,
-                    unit=None
-                ),
+                time_range=TimeRange(mode="preset", preset="last_month", last=None, unit=None),
                 params=llm_response.params
             )
-        
-        # Fix 1c: Force preset mode for "last month" phrase (LLM often misclassifies this)
-        if "last month" in message_lower and llm_response.time_range:
-            if llm_response.time_range.mode == "relative" and llm_response.time_range.last == 30 and llm_response.time_range.unit == "days":
-                # LLM incorrectly interpreted "last month" as "last 30 days"
-                llm_response = QuerySpec(
-                    is_banking_domain=llm_response.is_banking_domain,
-                    intent=llm_response.intent,
-                    time_range=TimeRange(mode="preset", preset="last_month", last=None, unit=None),
-                    params=llm_response.params
-                )
-        
-        # Fix 2: Distinguish between count-based and time-based queries
-        # Count: "last 7 transactions", "recent 20 transactions"
-        # Time: "last 7 days", "last 2 weeks"
-        parsed_limit = _parse_limit(message_lower)
-        parsed_time = _parse_time_range(message_lower)
-        
-        # Check if the query explicitly mentions a time unit (days/weeks/months)
-        has_time_unit = bool(re.search(r"\b(day|days|week|weeks|month|months|year|years)\b", message_lower))
-        
-        # If user says "N transactions" (count pattern), treat as count-based
-        # But if they also mention time units like "transactions for 2 weeks", use time-based
-        if parsed_limit is not None and not has_time_unit:
-            # Pure count-based query: "last 7 transactions", "recent 20 transactions"
-            updated_params = llm_response.params.copy()
-            updated_params["limit_only"] = True
-            updated_params["limit"] = parsed_limit
+    
+    # Fix 2: Distinguish between count-based and time-based queries
+    # Count: "last 7 transactions", "recent 20 transactions"
+    # Time: "last 7 days", "last 2 weeks"
+    parsed_limit = sig.limit
+    parsed_time = time_range_from(sig)
+    
+    # Check if the query explicitly mentions a time unit (days/weeks/months)
+    has_time_unit = sig.has_time_unit
+    
+    # If user says "N transactions" (count pattern), treat as count-based
+    # But if they also mention time units like "transactions for 2 weeks", use time-based
+    if parsed_limit is not None and not has_time_unit:
+        # Pure count-based query: "last 7 transactions", "recent 20 transactions"
+        updated_params = llm_response.params.copy()
+        updated_params["limit_only"] = True
+        updated_params["limit"] = parsed_limit
+        llm_response = QuerySpec(
+            is_banking_domain=llm_response.is_banking_domain,
+            intent=llm_response.intent,
+            time_range=None,  # Clear time_range for count-based queries
+            params=updated_params
+        )
+    elif parsed_time is not None or has_time_unit:
+        # Time-based query: "last 2 weeks", "transactions for 7 days"
+        if llm_response.params.get("limit_only"):
+            # Remove limit_only if it's actually a time-based query
+            updated_params = {k: v for k, v in llm_response.params.items() if k != "limit_only"}
             llm_response = QuerySpec(
                 is_banking_domain=llm_response.is_banking_domain,
                 intent=llm_response.intent,
-                time_range=None,  # Clear time_range for count-based queries
+                time_range=llm_response.time_range if llm_response.time_range else parsed_time,
                 params=updated_params
             )
-        elif parsed_time is not None or has_time_unit:
-            # Time-based query: "last 2 weeks", "transactions for 7 days"
-            if llm_response.params.get("limit_only"):
-                # Remove limit_only if it's actually a time-based query
-                updated_params = {k: v for k, v in llm_response.params.items() if k != "limit_only"}
-                llm_response = QuerySpec(
-                    is_banking_domain=llm_response.is_banking_domain,
-                    intent=llm_response.intent,
-                    time_range=llm_response.time_range if llm_response.time_range else parsed_time,
-                    params=updated_params
-                )
-        
-        print(f"[QUERY_SPEC] Final is_banking_domain={llm_response.is_banking_domain}")
-        return llm_response
-    except Exception as e:
-       print(f"[QUERY_SPEC] LLM query spec failed: {e}, falling back to rules-based")
-       return _compile_rules(message, context)
+    return llm_response
 
 
-def _compile_rules(message: str, context: Optional[ConversationContext]) -> QuerySpec:
+def _compile_rules_scored(message: str, context: Optional[ConversationContext]) -> Tuple[QuerySpec, float]:
+    """
+    Rules-based QuerySpec plus a confidence in [0, 1]. Confidence drops when
+    the message carries signals for more than one intent, or when the rules
+    have to guess (defaulted time range, unmatched text).
+    """
     text = (message or "").lower().strip()
-    print(f"[RULES_FALLBACK] Processing: '{text}'")
+    print(f"[RULES] Processing: '{text}'")
+    sig = scan(text)
 
     # ---- 0) Check for non-banking queries (greetings, general questions) ----
-    # Common greetings and non-banking phrases
-    greetings = ["hello", "hi", "hey", "good morning", "good afternoon", "good evening", "thanks", "thank you"]
     # Check if message is ONLY a greeting with no banking keywords
-    banking_keywords = ["transaction", "spend", "payment", "money", "balance", "charge", "subscription", "bill"]
-    is_greeting = any(greet in text for greet in greetings)
-    has_banking = any(keyword in text for keyword in banking_keywords)
-    print(f"[RULES_FALLBACK] is_greeting={is_greeting}, has_banking={has_banking}")
-    
+    is_greeting = sig.has("hello", "hi", "hey", "good morning", "good afternoon", "good evening", "thanks", "thank you")
+    has_banking = sig.has("transaction", "spend", "payment", "money", "balance", "charge", "subscription", "bill")
+    print(f"[RULES] is_greeting={is_greeting}, has_banking={has_banking}")
+
+    # Intent signals, used to spot messages that straddle intents
+    # "how much money" alone also opens spending questions; same test as _postprocess Fix 0
+    is_balance = sig.has("balance") or (sig.has("how much money") and sig.has("have", "do i"))
+    is_unrecognized = (
+        sig.has("don't recognize", "dont recognize", "unrecognized")
+        or (sig.has("what is this") and sig.has("charge", "transaction"))
+    )
+    is_recurring = sig.has("recurring", "subscription")
+    is_top_spending = (
+        (sig.has("top", "biggest", "most") and sig.has("spend"))
+        or (sig.has("where") and sig.has("money", "spend"))
+        or sig.has("spending categor")
+    )
+    is_list = sig.has("transaction") and not (is_unrecognized or is_recurring or is_top_spending)
+    n_signals = sum([is_balance, is_unrecognized, is_recurring, is_top_spending, is_list])
+    ambiguity = 1.0 if n_signals <= 1 else 0.5
+
     if is_greeting and not has_banking:
-        print(f"[RULES_FALLBACK] Detected as greeting -> is_banking_domain=False")
+        print(f"[RULES] Detected as greeting -> is_banking_domain=False")
+        # Short pleasantries are unambiguous; longer text may be an off-topic question worth the LLM
+        confidence = 0.95 if len(text.split()) <= 4 else 0.6
         return QuerySpec(
             is_banking_domain=False,
             intent="transactions_list",  # Default intent (won't be used)
             time_range=None,
             params={},
-        )
+        ), confidence
 
     # ---- 1) intent detection ----
     # Balance queries
-    if "balance" in text or "how much money" in text:
+    if is_balance:
         return QuerySpec(
             is_banking_domain=True,
             intent="account_balance",
             time_range=None,
             params={},
-        )
-    
+        ), (0.5 if sig.has("spend") else 0.95) * ambiguity
+
     # Unrecognized transaction
-    if (
-        "don't recognize" in text
-        or "dont recognize" in text
-        or "unrecognized" in text
-        or ("what is this" in text and ("charge" in text or "transaction" in text))
-    ):
+    if is_unrecognized:
         # Extract transaction ID directly from message (don't rely on context)
-        tx_id = _extract_tx_id(text)
+        tx_id = sig.tx_id
         return QuerySpec(
             is_banking_domain=True,
             intent="unrecognized_transaction",
             time_range=_default_time("unrecognized_transaction"),
             params={"transaction_id": tx_id},
-        )
+        ), 0.95 * ambiguity
 
-    if "recurring" in text or "subscription" in text or "subscriptions" in text:
+    if is_recurring:
         return QuerySpec(
             is_banking_domain=True,
             intent="recurring_payments",
             time_range=_default_time("recurring_payments"),
             params={"min_occurrences": 3},
-        )
+        ), 0.9 * ambiguity
 
     # Top spending queries - match various patterns
-    if (("top" in text or "biggest" in text or "most" in text) and ("spend" in text or "spending" in text)) or \
-       ("where" in text and ("money" in text or "spend" in text)) or \
-       ("spending categor" in text):
+    if is_top_spending:
+        # Rules always answer year-to-date; any other period in the message needs the LLM
+        tr = time_range_from(sig)
+        period_ok = tr is None or tr.preset == "ytd"
         return QuerySpec(
             is_banking_domain=True,
             intent="top_spending_ytd",
             time_range=TimeRange(mode="preset", preset="ytd"),
             params={"top_k": 5},
-        )
+        ), (0.9 if period_ok else 0.4) * ambiguity
 
     # transactions list: if they mention transactions at all
-    if "transaction" in text or "transactions" in text:
-        tr = _parse_time_range(text)
-        parsed_limit = _parse_limit(text)
+    if sig.has("transaction"):
+        tr = time_range_from(sig)
+        parsed_limit = sig.limit
         limit = parsed_limit if parsed_limit is not None else 50
         
         # If user is asking for a specific count and no time range mentioned,
@@ -215,8 +297,13 @@ def _compile_rules(message: str, context: Optional[ConversationContext]) -> Quer
         if parsed_limit is not None and tr is None:
             params["limit_only"] = True
             # Leave tr as None for count-based queries
+            confidence = 0.9
         else:
             # Only set default time range if user didn't specify a count-only query
+            confidence = 0.9 if tr is not None else 0.7
+            # "ytd" / "year to date" reads as a spending summary as often as a list
+            if sig.has("ytd", "year to date"):
+                confidence = 0.5
             tr = tr or _default_time("transactions_list")
         
         return QuerySpec(
@@ -224,7 +311,7 @@ def _compile_rules(message: str, context: Optional[ConversationContext]) -> Quer
             intent="transactions_list",
             time_range=tr,
             params=params,
-        )
+        ), confidence * ambiguity
 
     # safe fallback: show last 30 days transactions
     return QuerySpec(
@@ -232,7 +319,7 @@ def _compile_rules(message: str, context: Optional[ConversationContext]) -> Quer
         intent="transactions_list",
         time_range=_default_time("transactions_list"),
         params={"limit": 50, "include_pending": True},
-    )
+    ), 0.1
 
 
 def _default_time(intent: str) -> TimeRange:
@@ -241,50 +328,3 @@ def _default_time(intent: str) -> TimeRange:
     if intent == "recurring_payments":
         return TimeRange(mode="relative", last=3, unit="months")
     return TimeRange(mode="relative", last=30, unit="days")
-
-
-def _parse_time_range(text: str) -> Optional[TimeRange]:
-    if "this year" in text or "ytd" in text or "year to date" in text:
-        return TimeRange(mode="preset", preset="ytd")
-    if "this month" in text:
-        return TimeRange(mode="preset", preset="this_month")
-    if "last month" in text:
-        return TimeRange(mode="preset", preset="last_month")
-    # Handle "last week" without a number
-    if "last week" in text:
-        from src.schemas import TimeUnit
-        return TimeRange(mode="relative", last=1, unit=cast(TimeUnit, "weeks"))
-
-    m = re.search(r"\b(last|past|previous)\s+(\d+)\s+(day|days|week|weeks|month|months|year|years)\b", text)
-    if not m:
-        return None
-
-    n = int(m.group(2))
-    unit_word = m.group(3)
-    unit = {
-        "day": "days", "days": "days",
-        "week": "weeks", "weeks": "weeks",
-        "month": "months", "months": "months",
-        "year": "years", "years": "years",
-    }[unit_word]
-
-    from src.schemas import TimeUnit
-    return TimeRange(mode="relative", last=n, unit=cast(TimeUnit, unit))
-
-
-def _parse_limit(text: str) -> Optional[int]:
-    # Patterns: "last 10 transactions", "give me 20 transactions", "I need 15 transactions"
-    # Try pattern with verb/adjective first: "(give me|show|last|recent) N transactions"
-    m = re.search(r"\b(give\s+me|show\s+me|show|last|recent|my|need|want)\s+(\d+)\s+transactions?\b", text)
-    if m:
-        return int(m.group(2))
-    # Also try simple "N transactions" pattern
-    m = re.search(r"\b(\d+)\s+transactions?\b", text)
-    if m:
-        return int(m.group(1))
-    return None
-
-
-def _extract_tx_id(text: str) -> Optional[str]:
-    m = re.search(r"\b(t\d{3})\b", text)
-    return m.group(1) if m else None
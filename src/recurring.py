@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from statistics import median
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .schemas import RecurringPayment, Transaction
+
+
+def classify_cadence(median_gap_days: float) -> str:
+    targets = [
+        ("weekly", 7),
+        ("biweekly", 14),
+        ("monthly", 30),
+        ("quarterly", 90),
+        ("yearly", 365),
+    ]
+    best_name = "unknown"
+    best_score = 0.0
+
+    for name, target in targets:
+        diff = abs(median_gap_days - target)
+        score = max(0.0, 1.0 - (diff / target))  # 1.0 is perfect match
+        if score > best_score:
+            best_name = name
+            best_score = score
+
+    # Require a decent match; otherwise call it unknown
+    return best_name if best_score >= 0.75 else "unknown"
+
+
+class MerchantState:
+    """
+    Posted-debit history of one merchant, ordered by (local date, instant) so
+    date windows are two bisects, plus windowed state for the reads: amount
+    prefix sums (window average in O(1)) and day gaps, with the summary of
+    each recently asked window kept until the history next changes. A UI
+    polling the same window only recomputes after new transactions arrive.
+    """
+
+    # Windows remembered per merchant; more than the few a UI asks for at once means churn
+    _MAX_SUMMARIES = 8
+
+    def __init__(self, merchant: str):
+        self.merchant = merchant
+        self.keys: List[Tuple[int, datetime]] = []   # (local date ordinal, postedAt), sorted
+        self.amounts: List[float] = []
+        self._amount_prefix: List[float] = [0.0]     # _amount_prefix[i] = sum(amounts[:i])
+        self._summaries: Dict[Tuple[int, int], Optional[RecurringPayment]] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def copy(self) -> "MerchantState":
+        out = MerchantState(self.merchant)
+        out.keys, out.amounts = list(self.keys), list(self.amounts)
+        out._amount_prefix = list(self._amount_prefix)
+        return out
+
+    @property
+    def last_seen(self) -> datetime:
+        return self.keys[-1][1]
+
+    def _changed(self, i: int) -> None:
+        """Rows from index i on moved: redo their prefix sums and forget the summaries."""
+        del self._amount_prefix[i + 1:]
+        total = self._amount_prefix[i]
+        for amount in self.amounts[i:]:
+            total += amount
+            self._amount_prefix.append(total)
+        self._summaries.clear()
+
+    def add(self, posted_at: datetime, amount: float) -> None:
+        key = (posted_at.date().toordinal(), posted_at)
+        if not self.keys or key >= self.keys[-1]:
+            self.keys.append(key)
+            self.amounts.append(amount)
+            self._amount_prefix.append(self._amount_prefix[-1] + amount)
+            self._summaries.clear()
+            return
+        # Late arrival: insert in place and redo the prefix sums after it
+        i = bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.amounts.insert(i, amount)
+        self._changed(i)
+
+    def remove(self, posted_at: datetime, amount: float) -> bool:
+        """Drop one occurrence (a transaction that changed or went away); False if it isn't here."""
+        key = (posted_at.date().toordinal(), posted_at)
+        i = bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i] == key:
+            if self.amounts[i] == amount:
+                del self.keys[i], self.amounts[i]
+                self._changed(i)
+                return True
+            i += 1
+        return False
+
+    def summarize(self, start: Optional[date] = None, end: Optional[date] = None) -> Optional[RecurringPayment]:
+        """RecurringPayment for the occurrences within start..end (inclusive), or None if not recurring."""
+        lo = 0 if start is None else bisect_left(self.keys, (start.toordinal(),))
+        hi = len(self.keys) if end is None else bisect_left(self.keys, (end.toordinal() + 1,))
+        if (lo, hi) in self._summaries:
+            return self._summaries[(lo, hi)]
+        rec = self._summarize(lo, hi)
+        if len(self._summaries) >= self._MAX_SUMMARIES:
+            self._summaries.clear()
+        self._summaries[(lo, hi)] = rec
+        return rec
+
+    def _summarize(self, lo: int, hi: int) -> Optional[RecurringPayment]:
+        n = hi - lo
+        if n < 2:
+            return None
+        med = float(median(self.keys[i + 1][0] - self.keys[i][0] for i in range(lo, hi - 1)))
+        cadence = classify_cadence(med)
+        if cadence == "unknown":
+            return None
+        avg_amt = (self._amount_prefix[hi] - self._amount_prefix[lo]) / n
+        return RecurringPayment(
+            merchant=self.merchant,
+            cadence=cadence,  # type: ignore
+            averageAmount=round(avg_amt, 2),
+            occurrences=n,
+            lastSeenAt=self.keys[hi - 1][1],
+        )
+
+
+class RecurringDetector:
+    """
+    Incremental recurring-payment detector for one account. Feed it
+    transactions as they arrive; detect() reads straight from per-merchant
+    state instead of regrouping and re-sorting the account's history, and a
+    window asked for again is answered from each merchant's cached summary.
+    """
+
+    def __init__(self, transactions: Iterable[Transaction] = ()):
+        self._merchants: Dict[str, MerchantState] = {}
+        self._lock = threading.Lock()
+        self.add_many(transactions)
+
+    def add(self, tx: Transaction) -> None:
+        # posted debits only
+        if tx.direction != "debit" or tx.isPending:
+            return
+        self.add_posted(tx.merchant.name, tx.postedAt, tx.amount)
+
+    def add_posted(self, merchant: str, posted_at: datetime, amount: float) -> None:
+        """Add a posted debit by its fields, for callers that have no Transaction object."""
+        with self._lock:
+            state = self._merchants.get(merchant)
+            if state is None:
+                state = self._merchants[merchant] = MerchantState(merchant)
+            state.add(posted_at, amount)
+
+    def remove(self, tx: Transaction) -> None:
+        """Undo add(tx), e.g. before adding the transaction's corrected version."""
+        if tx.direction != "debit" or tx.isPending:
+            return
+        with self._lock:
+            state = self._merchants.get(tx.merchant.name)
+            if state is not None and state.remove(tx.postedAt, tx.amount) and not len(state):
+                del self._merchants[tx.merchant.name]
+
+    def add_many(self, transactions: Iterable[Transaction]) -> None:
+        for tx in transactions:
+            self.add(tx)
+
+    def apply(self, removed: Sequence[Transaction], added: Sequence[Transaction]) -> "RecurringDetector":
+        """
+        A new detector with `removed` undone and `added` added, leaving this
+        one untouched: the merchant states the change reaches are copied,
+        every other one is shared.
+        """
+        out = RecurringDetector()
+        with self._lock:
+            out._merchants = dict(self._merchants)
+        for name in {tx.merchant.name for tx in (*removed, *added)}:
+            state = out._merchants.get(name)
+            if state is not None:
+                out._merchants[name] = state.copy()
+        for tx in removed:
+            out.remove(tx)
+        out.add_many(added)
+        return out
+
+    def detect(
+        self,
+        min_occurrences: int = 3,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> List[RecurringPayment]:
+        out: List[RecurringPayment] = []
+        with self._lock:
+            for state in self._merchants.values():
+                if len(state) < min_occurrences:
+                    continue
+                rec = state.summarize(start, end)
+                if rec is not None and rec.occurrences >= min_occurrences:
+                    out.append(rec)
+
+        # sort: most frequent & largest first
+        out.sort(key=lambda r: (r.occurrences, r.averageAmount), reverse=True)
+        return out
+
+    def window(self, start: date, end: date) -> "RecurringWindow":
+        return RecurringWindow(self, start, end)
+
+
+class RecurringWindow:
+    """A detector bound to a date range; what handle_recurring_payments accepts in place of raw rows."""
+
+    def __init__(self, detector: RecurringDetector, start: date, end: date):
+        self.detector = detector
+        self.start = start
+        self.end = end
+
+    def detect(self, min_occurrences: int = 3) -> List[RecurringPayment]:
+        return self.detector.detect(min_occurrences, start=self.start, end=self.end)
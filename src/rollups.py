@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from .aggregate import GroupTotals, SpendBreakdown, spend_breakdown
+from .columnar import ColumnarTransactions
+from .schemas import Transaction
+
+
+def month_number(d: date) -> int:
+    """Months since 1970-01; the unit of SpendRollup.cell_month."""
+    return (d.year - 1970) * 12 + d.month - 1
+
+
+def _month_start(month: int) -> date:
+    return date(1970 + month // 12, month % 12 + 1, 1)
+
+
+def _full_months(start: date, end: date) -> Tuple[int, int]:
+    """[first, last] whole calendar months inside start..end (inclusive); first > last if none."""
+    first = month_number(start) + (0 if start.day == 1 else 1)
+    last = month_number(end) - (0 if (end + timedelta(days=1)).day == 1 else 1)
+    return first, last
+
+
+class SpendRollup:
+    """
+    Posted-debit totals and counts per (month, category, merchant) cell for
+    one account, built over the account's full columnar view.
+
+    Cells are stored sorted by month, so a month range is a searchsorted
+    slice; a date range only touches raw rows for its partial edge months.
+    """
+
+    def __init__(self, cols: ColumnarTransactions):
+        self._cols = cols
+        spend = cols.posted_spend_mask()
+        months = _months_of(cols.posted_day[spend])
+        n_cat = max(len(cols.categories), 1)
+        n_merch = max(len(cols.merchants), 1)
+        keys = (months * n_cat + cols.category_codes[spend]) * n_merch + cols.merchant_codes[spend]
+        cells, inverse = np.unique(keys, return_inverse=True)
+        self.cell_total = np.bincount(inverse, weights=cols.amount[spend], minlength=cells.size)
+        self.cell_count = np.bincount(inverse, minlength=cells.size)
+        self.cell_month = cells // (n_cat * n_merch)
+        self.cell_category = ((cells // n_merch) % n_cat).astype(np.int32)
+        self.cell_merchant = (cells % n_merch).astype(np.int32)
+
+    def __len__(self) -> int:
+        return int(self.cell_total.size)
+
+    def apply(self, cols: ColumnarTransactions, removed: Sequence[Transaction], added: Sequence[Transaction]) -> "SpendRollup":
+        """
+        Copy over `cols` (the columns after the change) with the cells of the
+        removed and added transactions adjusted, instead of a rebuild. Cells
+        that drop to zero stay, like labels with no spend do in the columns.
+        """
+        out = SpendRollup.__new__(SpendRollup)
+        out._cols = cols
+        month, category, merchant = self.cell_month.copy(), self.cell_category.copy(), self.cell_merchant.copy()
+        total, count = self.cell_total.copy(), self.cell_count.copy()
+        category_code = {label: i for i, label in enumerate(cols.categories)}
+        merchant_code = {label: i for i, label in enumerate(cols.merchants)}
+        for tx, sign in [(t, -1) for t in removed] + [(t, 1) for t in added]:
+            if tx.direction != "debit" or tx.isPending:
+                continue
+            m = month_number(tx.postedAt.date())
+            c = category_code[tx.merchant.category or ""]
+            r = merchant_code[tx.merchant.name or ""]
+            lo = int(np.searchsorted(month, m, side="left"))
+            hi = int(np.searchsorted(month, m, side="right"))
+            hit = np.flatnonzero((category[lo:hi] == c) & (merchant[lo:hi] == r))
+            if hit.size:
+                j = lo + int(hit[0])
+                total[j] += sign * tx.amount
+                count[j] += sign
+            else:
+                # Cells only need to be ordered by month; a new one goes at the end of its month
+                month = np.insert(month, hi, m)
+                category = np.insert(category, hi, c)
+                merchant = np.insert(merchant, hi, r)
+                total = np.insert(total, hi, sign * tx.amount)
+                count = np.insert(count, hi, sign)
+        out.cell_month, out.cell_category, out.cell_merchant = month, category, merchant
+        out.cell_total, out.cell_count = total, count
+        return out
+
+    def breakdown(self, start: date, end: date) -> SpendBreakdown:
+        """Category/merchant spend for start <= posted date <= end (inclusive)."""
+        cols = self._cols
+        first, last = _full_months(start, end)
+        if first > last:
+            lo, hi = cols.day_bounds(start, end)
+            return spend_breakdown(cols.slice(lo, hi))
+
+        result = self._months(first, last)
+        month_lo = _month_start(first)
+        after = _month_start(last + 1)
+        if start < month_lo:
+            lo, hi = cols.day_bounds(start, month_lo - timedelta(days=1))
+            result = result + spend_breakdown(cols.slice(lo, hi))
+        if end >= after:
+            lo, hi = cols.day_bounds(after, end)
+            result = result + spend_breakdown(cols.slice(lo, hi))
+        return result
+
+    def _months(self, first: int, last: int) -> SpendBreakdown:
+        cols = self._cols
+        lo = int(np.searchsorted(self.cell_month, first, side="left"))
+        hi = int(np.searchsorted(self.cell_month, last, side="right"))
+        totals = self.cell_total[lo:hi]
+        counts = self.cell_count[lo:hi]
+        by_cat = self.cell_category[lo:hi]
+        by_merch = self.cell_merchant[lo:hi]
+        return SpendBreakdown(
+            total=float(totals.sum()),
+            groups={
+                "category": GroupTotals(
+                    labels=cols.categories,
+                    totals=np.bincount(by_cat, weights=totals, minlength=len(cols.categories)),
+                    counts=np.bincount(by_cat, weights=counts, minlength=len(cols.categories)).astype(np.int64),
+                ),
+                "merchant": GroupTotals(
+                    labels=cols.merchants,
+                    totals=np.bincount(by_merch, weights=totals, minlength=len(cols.merchants)),
+                    counts=np.bincount(by_merch, weights=counts, minlength=len(cols.merchants)).astype(np.int64),
+                ),
+            },
+        )
+
+
+def _months_of(posted_day: np.ndarray) -> np.ndarray:
+    return posted_day.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Any, Dict, List, Literal, Optional, Union
 from pydantic import BaseModel, Field, model_validator
 
@@ -22,6 +22,43 @@ class Transaction(BaseModel):
     paymentRail: Optional[Literal["Card", "ACH", "Zelle", "Wire", "Check", "ATM"]] = None
     cardLast4: Optional[str] = None
 
+# Batch lookups: POST /tool/transactions:batch
+MAX_BATCH_QUERIES = 1000
+
+class TransactionQuery(BaseModel):
+    accountId: str
+    start: date
+    end: date
+    includePending: bool = True
+    limit: int = Field(500, ge=1, le=5000)
+    order: Literal["desc", "asc"] = "desc"
+    cursor: Optional[str] = None
+
+class TransactionBatchRequest(BaseModel):
+    queries: List[TransactionQuery] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES)
+
+class TransactionBatchResult(BaseModel):
+    index: int                     # position of the query in the request
+    accountId: str
+    status: int = 200              # per-item HTTP-style status; the batch itself is always 200
+    transactions: Optional[List[Transaction]] = None
+    nextCursor: Optional[str] = None
+    error: Optional[str] = None
+
+# Ingestion: POST /tool/transactions:ingest
+MAX_INGEST_TRANSACTIONS = 5000
+ACCOUNT_ID_PATTERN = r"^[A-Za-z0-9_-]+$"   # ingest may create data/txns_{accountId}.json
+
+class TransactionIngestRequest(BaseModel):
+    accountId: str = Field(..., pattern=ACCOUNT_ID_PATTERN)
+    # Each is an upsert by id: a new transaction, or a new version of one (e.g. pending -> posted)
+    transactions: List[Transaction] = Field(..., min_length=1, max_length=MAX_INGEST_TRANSACTIONS)
+
+class TransactionIngestResult(BaseModel):
+    accountId: str
+    inserted: int
+    updated: int
+
 # =========================
 # Derived analytics
 # =========================
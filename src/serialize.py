@@ -0,0 +1,42 @@
+"""
+JSON bodies written straight from objects the app already trusts (store rows,
+orchestrator output), returned as a raw Response. Returning the model instead
+makes FastAPI validate it against response_model (or run jsonable_encoder
+over it when there is none) before encoding: for 5000 transactions that pass
+costs far more than the encoding itself.
+
+Encoding goes through pydantic-core's serializer, the Rust encoder FastAPI
+uses for the final step anyway, so the bytes are the same as before
+(e.g. "Z" for UTC, where orjson would write "+00:00").
+"""
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+import pydantic_core
+from fastapi import Response
+from pydantic import BaseModel
+
+from .schemas import Transaction
+
+_TRANSACTION = Transaction.__pydantic_serializer__
+
+
+class RawJSONResponse(Response):
+    """A body that is already JSON bytes."""
+    media_type = "application/json"
+
+
+def transaction_json(tx: Transaction) -> bytes:
+    return _TRANSACTION.to_json(tx)
+
+
+def json_array(fragments: Iterable[bytes]) -> bytes:
+    return b"[" + b",".join(fragments) + b"]"
+
+
+def dumps(obj: Any) -> bytes:
+    """Models, lists and dicts of them, dates... as FastAPI would encode them, minus its validation pass."""
+    if isinstance(obj, BaseModel):
+        return obj.__pydantic_serializer__.to_json(obj)
+    return pydantic_core.to_json(obj)
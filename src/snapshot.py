@@ -0,0 +1,397 @@
+"""
+Compact binary snapshots of data/txns_*.json.
+
+A snapshot holds one account's transactions, sorted by row_key (local
+posting date, then postedAt, then id: the store's order), as
+one array per column (struct of arrays), each ready to map straight onto a
+numpy array:
+
+    magic      8 bytes   b"TXSNAP" + VERSION as two digits (b"TXSNAP03")
+    hlen       uint32    length of the JSON header
+    header     hlen      {"version" (= VERSION), "count", "source": [size, mtime_ns], "sections", "dicts"}
+    (zero padding to a multiple of 8)
+    sections   the arrays in SECTIONS, each 8-byte aligned; the header
+               gives every section's dtype, offset and length
+
+String columns are int32 codes into small per-column dictionaries kept in
+the header; transaction ids, which are unique, live in a UTF-8 blob with an
+offsets array, plus the row numbers sorted by id for lookups.
+
+Loading is a handful of np.frombuffer calls, with no JSON parsing and no
+per-record Pydantic validation. Over an mmap (STORE_BACKEND=mmap) the
+arrays are views of the page cache shared by every process mapping the
+file. The header records the size/mtime of the JSON file it was compiled
+from, so a stale snapshot is detected and the store falls back to the JSON.
+Compile with:
+
+    python -m src.snapshot [data/txns_A123.json ...]   (default: every data/txns_*.json)
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import sys
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union, overload
+
+import numpy as np
+
+from .columnar import ColumnarTransactions
+from .schemas import Merchant, Transaction
+
+VERSION = 3   # 3: rows ordered by local date first
+MAGIC = b"TXSNAP%02d" % VERSION
+SUFFIX = ".snap"
+
+# Section name -> dtype, in file order. The ColumnarTransactions columns are
+# stored exactly as that class holds them so mapping them needs no conversion.
+SECTIONS: Tuple[Tuple[str, str], ...] = (
+    ("posted_us", "<i8"),           # UTC epoch microseconds (naive timestamps taken as UTC)
+    ("posted_at", "<i8"),           # UTC epoch seconds
+    ("tz_offset_min", "<i2"),
+    ("posted_day", "<i4"),
+    ("amount", "<f8"),
+    ("is_debit", "?"),
+    ("is_pending", "?"),
+    ("is_naive", "?"),              # postedAt had no tzinfo
+    ("account_codes", "<i4"),
+    ("merchant_codes", "<i4"),
+    ("category_codes", "<i4"),
+    ("subcategory_codes", "<i4"),
+    ("rail_codes", "<i4"),
+    ("card_codes", "<i4"),
+    ("id_offsets", "<u8"),          # count + 1 byte offsets into id_blob
+    ("id_blob", "u1"),
+    ("id_order", "<i4"),            # row numbers sorted by id
+)
+# Dictionary-encoded string columns: header "dicts" key -> codes section
+DICTS = {
+    "account": "account_codes",
+    "merchant": "merchant_codes",
+    "category": "category_codes",
+    "subcategory": "subcategory_codes",
+    "rail": "rail_codes",
+    "card": "card_codes",
+}
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def snapshot_path(json_path: Path) -> Path:
+    return json_path.with_suffix(SUFFIX)
+
+
+def source_version(json_path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = json_path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+# ----------------------------
+# Writing
+# ----------------------------
+
+def row_key(t: Transaction) -> Tuple[date, datetime, str]:
+    """Row order of snapshots and of the store's indexes: local posting date, postedAt, id."""
+    return (t.postedAt.date(), t.postedAt, t.id)
+
+
+def _codes(values: Iterable[Optional[str]], count: int) -> Tuple[np.ndarray, List[Optional[str]]]:
+    # Like columnar._encode (first-seen order) but keeps None distinct so rows round-trip
+    lookup: Dict[Optional[str], int] = {}
+    codes = np.fromiter((lookup.setdefault(v, len(lookup)) for v in values), dtype=np.int32, count=count)
+    return codes, list(lookup)
+
+
+def write_snapshot(transactions: Sequence[Transaction], out_path: Path, source: Optional[Tuple[int, int]] = None) -> int:
+    """Write `transactions` as a snapshot; returns the record count."""
+    txs = sorted(transactions, key=row_key)
+    n = len(txs)
+    cols = ColumnarTransactions.from_transactions(txs)
+    ids = [t.id.encode("utf-8") for t in txs]
+    id_offsets = np.zeros(n + 1, dtype="<u8")
+    np.cumsum([len(b) for b in ids], out=id_offsets[1:])
+
+    arrays: Dict[str, np.ndarray] = {
+        "posted_us": np.fromiter((_epoch_us(t.postedAt) for t in txs), dtype=np.int64, count=n),
+        "posted_at": cols.posted_at,
+        "tz_offset_min": cols.tz_offset_min,
+        "posted_day": cols.posted_day,
+        "amount": cols.amount,
+        "is_debit": cols.is_debit,
+        "is_pending": cols.is_pending,
+        "is_naive": np.fromiter((t.postedAt.tzinfo is None for t in txs), dtype=np.bool_, count=n),
+        "id_offsets": id_offsets,
+        "id_blob": np.frombuffer(b"".join(ids), dtype=np.uint8),
+        "id_order": np.array(sorted(range(n), key=lambda i: txs[i].id), dtype=np.int32),
+    }
+    dicts: Dict[str, List[Optional[str]]] = {}
+    for name, values in (
+        ("account", (t.accountId for t in txs)),
+        ("merchant", (t.merchant.name for t in txs)),
+        ("category", (t.merchant.category for t in txs)),
+        ("subcategory", (t.merchant.subcategory for t in txs)),
+        ("rail", (t.paymentRail for t in txs)),
+        ("card", (t.cardLast4 for t in txs)),
+    ):
+        arrays[DICTS[name]], dicts[name] = _codes(values, n)
+
+    sections: Dict[str, List[Any]] = {}
+    body: List[bytes] = []
+    pos = 0
+    for name, dtype in SECTIONS:
+        data = np.ascontiguousarray(arrays[name], dtype=dtype).tobytes()
+        sections[name] = [dtype, pos, len(data) // np.dtype(dtype).itemsize]
+        body.append(data + b"\0" * (-len(data) % 8))
+        pos += len(body[-1])
+    header = json.dumps({
+        "version": VERSION,
+        "count": n,
+        "source": list(source) if source else None,
+        "sections": sections,
+        "dicts": dicts,
+    }).encode()
+    prefix = MAGIC + len(header).to_bytes(4, "little") + header
+    prefix += b"\0" * (-len(prefix) % 8)
+
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(prefix)
+        for chunk in body:
+            f.write(chunk)
+    tmp.replace(out_path)  # atomic: readers (and live mappings of the old file) never see a half-written snapshot
+    return n
+
+
+def compile_snapshot(json_path: Path) -> Path:
+    """Compile data/txns_X.json into data/txns_X.snap next to it."""
+    source = source_version(json_path)
+    with open(json_path, "r") as f:
+        tx_list = json.load(f)
+    out = snapshot_path(json_path)
+    write_snapshot([Transaction.model_validate(tx) for tx in tx_list], out, source)
+    return out
+
+
+def _epoch_us(dt: datetime) -> int:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return (dt - _EPOCH_UTC) // timedelta(microseconds=1)
+
+
+# ----------------------------
+# Reading
+# ----------------------------
+
+class Snapshot:
+    """Decoded view over a snapshot's bytes (a bytes object or an mmap); arrays are not copied."""
+
+    def __init__(self, buf: Union[bytes, mmap.mmap]) -> None:
+        if bytes(buf[:8]) != MAGIC:
+            raise SnapshotError("not a transaction snapshot (or an older format); recompile it")
+        hlen = int.from_bytes(buf[8:12], "little")
+        self.header: Dict[str, Any] = json.loads(bytes(buf[12:12 + hlen]))
+        if self.header.get("version") != VERSION:
+            raise SnapshotError(f"snapshot header says version {self.header.get('version')}, expected {VERSION}; recompile it")
+        base = 12 + hlen
+        base += -base % 8
+        self.count: int = self.header["count"]
+        self.arrays: Dict[str, np.ndarray] = {}
+        for name, (dtype, offset, length) in self.header["sections"].items():
+            if length == 0:
+                self.arrays[name] = np.empty(0, dtype=dtype)
+            else:
+                self.arrays[name] = np.frombuffer(buf, dtype=dtype, count=length, offset=base + offset)
+        self.dicts: Dict[str, List[Optional[str]]] = self.header["dicts"]
+        self._merchants: Dict[Tuple[int, int, int], Merchant] = {}
+        self._zones: Dict[int, timezone] = {}
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def source(self) -> Optional[Tuple[int, int]]:
+        src = self.header.get("source")
+        return (src[0], src[1]) if src else None
+
+    def id_at(self, i: int) -> str:
+        offsets = self.arrays["id_offsets"]
+        return self.arrays["id_blob"][int(offsets[i]):int(offsets[i + 1])].tobytes().decode("utf-8")
+
+    def find(self, tx_id: str) -> Optional[int]:
+        """Row number of the transaction with this id: a bisect over id_order, no per-process dict."""
+        order = self.arrays["id_order"]
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.id_at(int(order[mid])) < tx_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self.id_at(int(order[lo])) == tx_id:
+            return int(order[lo])
+        return None
+
+    def transaction(self, i: int) -> Transaction:
+        """Row i as a Transaction, built with model_construct: the data was validated at compile time."""
+        a = self.arrays
+        return self._build(
+            self.id_at(i), int(a["posted_us"][i]), int(a["tz_offset_min"][i]), bool(a["is_naive"][i]),
+            float(a["amount"][i]), bool(a["is_debit"][i]), bool(a["is_pending"][i]),
+            int(a["account_codes"][i]), int(a["merchant_codes"][i]), int(a["category_codes"][i]),
+            int(a["subcategory_codes"][i]), int(a["rail_codes"][i]), int(a["card_codes"][i]),
+        )
+
+    def transactions(self) -> List[Transaction]:
+        """Every row as a Transaction, in snapshot (sorted) order."""
+        a = self.arrays
+        blob = a["id_blob"].tobytes()
+        bounds = a["id_offsets"].tolist()
+        ids = [blob[lo:hi].decode("utf-8") for lo, hi in zip(bounds, bounds[1:])]
+        build = self._build
+        return [
+            build(*row) for row in zip(
+                ids, a["posted_us"].tolist(), a["tz_offset_min"].tolist(), a["is_naive"].tolist(),
+                a["amount"].tolist(), a["is_debit"].tolist(), a["is_pending"].tolist(),
+                a["account_codes"].tolist(), a["merchant_codes"].tolist(), a["category_codes"].tolist(),
+                a["subcategory_codes"].tolist(), a["rail_codes"].tolist(), a["card_codes"].tolist(),
+            )
+        ]
+
+    def _build(
+        self, tx_id: str, posted_us: int, off: int, naive: bool, amount: float, debit: bool, pending: bool,
+        i_acct: int, i_m: int, i_c: int, i_s: int, i_rail: int, i_card: int,
+    ) -> Transaction:
+        d = self.dicts
+        posted_at = self._datetime(posted_us, off, naive)
+        key = (i_m, i_c, i_s)
+        merchant = self._merchants.get(key)
+        if merchant is None:
+            merchant = self._merchants[key] = Merchant.model_construct(
+                name=d["merchant"][i_m], category=d["category"][i_c], subcategory=d["subcategory"][i_s],
+            )
+        return Transaction.model_construct(
+            id=tx_id,
+            accountId=d["account"][i_acct],
+            postedAt=posted_at,
+            direction="debit" if debit else "credit",
+            amount=amount,
+            merchant=merchant,
+            isPending=pending,
+            paymentRail=d["rail"][i_rail],
+            cardLast4=d["card"][i_card],
+        )
+
+    def _datetime(self, posted_us: int, off: int, naive: bool) -> datetime:
+        local = _EPOCH + timedelta(microseconds=posted_us + off * 60_000_000)
+        if naive:
+            return local
+        tz = self._zones.get(off)
+        if tz is None:
+            tz = self._zones[off] = timezone.utc if off == 0 else timezone(timedelta(minutes=off))
+        return local.replace(tzinfo=tz)
+
+    def posted_datetimes(self, rows: np.ndarray) -> List[datetime]:
+        """postedAt of the given rows, without building their Transactions."""
+        a = self.arrays
+        to_dt = self._datetime
+        return [
+            to_dt(us, off, naive)
+            for us, off, naive in zip(a["posted_us"][rows].tolist(), a["tz_offset_min"][rows].tolist(), a["is_naive"][rows].tolist())
+        ]
+
+    def columns(self) -> ColumnarTransactions:
+        """ColumnarTransactions whose arrays are the snapshot's own (views, not copies)."""
+        a = self.arrays
+        cols = ColumnarTransactions.__new__(ColumnarTransactions)
+        for name in ("posted_at", "tz_offset_min", "posted_day", "amount", "is_debit", "is_pending"):
+            setattr(cols, name, a[name])
+        for key, labels_attr in (
+            ("merchant", "merchants"), ("category", "categories"), ("subcategory", "subcategories"),
+            ("rail", "rails"), ("card", "cards"),
+        ):
+            setattr(cols, DICTS[key], a[DICTS[key]])
+            setattr(cols, labels_attr, [v or "" for v in self.dicts[key]])
+        return cols
+
+
+class LazyTransactions(Sequence[Transaction]):
+    """A snapshot's rows as a read-only sequence; each item is built when it is read, not kept."""
+
+    def __init__(self, snap: Snapshot):
+        self._snap = snap
+
+    def __len__(self) -> int:
+        return len(self._snap)
+
+    @overload
+    def __getitem__(self, i: int) -> Transaction: ...
+    @overload
+    def __getitem__(self, i: slice) -> List[Transaction]: ...
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Transaction, List[Transaction]]:
+        if isinstance(i, slice):
+            return [self._snap.transaction(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("transaction index out of range")
+        return self._snap.transaction(i)
+
+
+def read_snapshot(path: Path) -> Snapshot:
+    with open(path, "rb") as f:
+        return Snapshot(f.read())
+
+
+def map_snapshot(path: Path) -> Snapshot:
+    """Snapshot over a read-only mmap of the file; pages are shared with every other mapping of it."""
+    with open(path, "rb") as f:
+        # The mapping outlives the descriptor; the arrays keep it alive
+        return Snapshot(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def load_fresh(json_path: Path, mapped: bool = False) -> Optional[Snapshot]:
+    """The snapshot for json_path if it exists and was compiled from the JSON as it is now."""
+    snap_path = snapshot_path(json_path)
+    if not snap_path.exists():
+        return None
+    try:
+        snap = map_snapshot(snap_path) if mapped else read_snapshot(snap_path)
+    except (OSError, ValueError) as e:
+        print(f"[SNAPSHOT] Ignoring unreadable {snap_path.name}: {e}")
+        return None
+    if snap.source != source_version(json_path):
+        print(f"[SNAPSHOT] {snap_path.name} is stale (JSON changed since compile); using JSON")
+        return None
+    return snap
+
+
+def _self_check(json_path: Path) -> None:
+    # Compiled output must round-trip to the same models the JSON path produces
+    with open(json_path, "r") as f:
+        expected = sorted((Transaction.model_validate(tx) for tx in json.load(f)), key=row_key)
+    got = read_snapshot(snapshot_path(json_path)).transactions()
+    if [t.model_dump() for t in got] != [t.model_dump() for t in expected]:
+        raise SnapshotError(f"{json_path.name}: snapshot does not round-trip")
+
+
+def main(paths: Sequence[str]) -> None:
+    data_dir = Path(__file__).resolve().parents[1] / "data"
+    targets = [Path(p) for p in paths] or sorted(data_dir.glob("txns_*.json"))
+    for json_path in targets:
+        out = compile_snapshot(json_path)
+        _self_check(json_path)
+        print(f"[SNAPSHOT] {json_path.name} -> {out.name} ({out.stat().st_size:,} bytes, was {json_path.stat().st_size:,})")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
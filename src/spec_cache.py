@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import math
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from src.cache import LRUCache
+from src.config import SPEC_CACHE_FUZZY_THRESHOLD, SPEC_CACHE_MAX_ENTRIES, SPEC_CACHE_TTL_SECONDS
+from src.schemas import QuerySpec
+
+# tx ids first so "t002" isn't read as a bare number
+_SLOT_RE = re.compile(r"\b(t\d{3})\b|\b(\d+)\b")
+
+Slot = Union[int, str]
+CacheKey = Tuple[str, str]  # ("slot", templated text) or ("exact", normalized text)
+
+
+class _Ambiguous(Exception):
+    pass
+
+
+def normalize(message: str) -> Tuple[str, str, List[Slot]]:
+    """
+    (normalized text, slot key, slot values) for a chat message.
+    Case, whitespace and trailing punctuation are folded; numbers become <n>
+    and transaction ids <tx>, so "Show my last 10 transactions" and
+    "show my last 7 transactions" share a slot key.
+    """
+    text = " ".join((message or "").lower().split()).rstrip("?!. ")
+    slots: List[Slot] = []
+
+    def _sub(m: "re.Match[str]") -> str:
+        if m.group(1):
+            slots.append(m.group(1))
+            return "<tx>"
+        slots.append(int(m.group(2)))
+        return "<n>"
+
+    return text, _SLOT_RE.sub(_sub, text), slots
+
+
+def _slot_for(value: Any, slots: List[Slot]) -> Optional[int]:
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        return None
+    matches = [i for i, s in enumerate(slots) if type(s) is type(value) and s == value]
+    if len(matches) > 1:
+        raise _Ambiguous()
+    return matches[0] if matches else None
+
+
+def _template(obj: Any, slots: List[Slot], used: List[int]) -> Any:
+    """Replace values that came from the message with {"__slot__": i} markers."""
+    if isinstance(obj, dict):
+        return {k: _template(v, slots, used) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_template(v, slots, used) for v in obj]
+    i = _slot_for(obj, slots)
+    if i is None:
+        return obj
+    used.append(i)
+    return {"__slot__": i}
+
+
+def _fill(obj: Any, slots: List[Slot]) -> Any:
+    if isinstance(obj, dict):
+        if set(obj) == {"__slot__"}:
+            return slots[obj["__slot__"]]
+        return {k: _fill(v, slots) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_fill(v, slots) for v in obj]
+    return obj
+
+
+def _trigrams(text: str) -> Counter:
+    padded = f"  {text}  "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    dot = sum(v * b.get(k, 0) for k, v in a.items())
+    norm = math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values()))
+    return dot / norm if norm else 0.0
+
+
+class QuerySpecCache:
+    """
+    Cache of compiled QuerySpecs in front of the LLM compiler.
+
+    A spec is stored as a template keyed by the message's slot key when
+    every number / tx id in the message maps to exactly one value in the
+    spec; otherwise it is only reused for the exact same normalized text.
+    With a fuzzy threshold > 0, a miss falls back to the most similar
+    cached slot key by character-trigram cosine (same slot shape only).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = SPEC_CACHE_MAX_ENTRIES,
+        ttl_seconds: Optional[float] = SPEC_CACHE_TTL_SECONDS,
+        fuzzy_threshold: float = SPEC_CACHE_FUZZY_THRESHOLD,
+    ):
+        self.fuzzy_threshold = fuzzy_threshold
+        self._vectors: Dict[str, Counter] = {}
+        self._vec_lock = threading.Lock()
+        self._cache: LRUCache[CacheKey, Dict[str, Any]] = LRUCache(
+            max_size=max_entries, ttl_seconds=ttl_seconds, on_evict=self._forget,
+        )
+        self.lookups = 0
+        self.slot_hits = 0
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.stores = 0
+        self.exact_only = 0
+
+    def _forget(self, key: CacheKey, _value: Dict[str, Any]) -> None:
+        if key[0] == "slot":
+            with self._vec_lock:
+                self._vectors.pop(key[1], None)
+
+    def get(self, message: str) -> Optional[QuerySpec]:
+        self.lookups += 1
+        text, slot_key, slots = normalize(message)
+        template = self._cache.get(("slot", slot_key))
+        if template is not None:
+            self.slot_hits += 1
+            return QuerySpec.model_validate(_fill(template, slots))
+        template = self._cache.get(("exact", text))
+        if template is not None:
+            self.exact_hits += 1
+            return QuerySpec.model_validate(template)
+        if self.fuzzy_threshold > 0:
+            near = self._nearest(slot_key)
+            if near is not None:
+                template = self._cache.get(("slot", near))
+                if template is not None:
+                    self.fuzzy_hits += 1
+                    return QuerySpec.model_validate(_fill(template, slots))
+        return None
+
+    def put(self, message: str, spec: QuerySpec) -> None:
+        text, slot_key, slots = normalize(message)
+        data = spec.model_dump(mode="json")
+        used: List[int] = []
+        try:
+            template = _template(data, slots, used)
+        except _Ambiguous:
+            template = None
+        self.stores += 1
+        if template is None or sorted(used) != list(range(len(slots))):
+            # Some number in the message can't be traced to one spot in the spec: only reuse verbatim
+            self.exact_only += 1
+            self._cache.put(("exact", text), data)
+            return
+        self._cache.put(("slot", slot_key), template)
+        if self.fuzzy_threshold > 0:
+            with self._vec_lock:
+                self._vectors[slot_key] = _trigrams(slot_key)
+
+    def _nearest(self, slot_key: str) -> Optional[str]:
+        shape = re.findall(r"<n>|<tx>", slot_key)
+        query = _trigrams(slot_key)
+        best, best_score = None, self.fuzzy_threshold
+        with self._vec_lock:
+            candidates = list(self._vectors.items())
+        for key, vec in candidates:
+            if re.findall(r"<n>|<tx>", key) != shape:
+                continue
+            score = _cosine(query, vec)
+            if score >= best_score:
+                best, best_score = key, score
+        return best
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        # The inner LRU counts each key probe; report per-message hits instead
+        base = self._cache.stats()
+        hits = self.slot_hits + self.exact_hits + self.fuzzy_hits
+        return {
+            "size": base["size"],
+            "max_size": base["max_size"],
+            "ttl_seconds": base["ttl_seconds"],
+            "lookups": self.lookups,
+            "hits": hits,
+            "misses": self.lookups - hits,
+            "hit_rate": round(hits / self.lookups, 4) if self.lookups else 0.0,
+            "slot_hits": self.slot_hits,
+            "exact_hits": self.exact_hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "stores": self.stores,
+            "exact_only_stores": self.exact_only,
+            "evictions": base["evictions"],
+            "expirations": base["expirations"],
+        }
+
+
+spec_cache = QuerySpecCache()
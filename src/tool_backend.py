@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import date
+from typing import Any, AsyncIterator, Dict, List, Optional, Protocol, Tuple, Union
+
+import httpx
+from fastapi import HTTPException
+
+from src import mock_store
+from src.aggregate import SpendBreakdown
+from src.mock_store import Order
+from src.config import TOOL_BACKEND, TOOL_BASE_URL
+from src.http_clients import ConditionalCache, get_client
+from src.recurring import RecurringWindow
+from src.schemas import Transaction
+from src.tools_api import NDJSON_MEDIA_TYPE, NEXT_CURSOR_HEADER
+
+# Same default page size /tool/transactions applies when no limit is passed, and its maximum
+DEFAULT_TOOL_LIMIT = 500
+MAX_TOOL_LIMIT = 5000
+
+
+# In-process iteration hands control back to the event loop every this many rows
+_YIELD_EVERY = 1024
+
+
+def _page_size(limit: Optional[int]) -> int:
+    return DEFAULT_TOOL_LIMIT if limit is None else max(1, min(limit, MAX_TOOL_LIMIT))
+
+
+class ToolBackend(Protocol):
+    """Where the orchestrator gets transaction data from."""
+
+    async def get_transactions(
+        self, account_id: str, start: date, end: date, limit: Optional[int] = None,
+    ) -> List[Transaction]: ...
+
+    def iter_transactions(
+        self, account_id: str, start: date, end: date, include_pending: bool = True, order: Order = "desc",
+    ) -> AsyncIterator[Transaction]: ...
+
+    async def get_transaction_by_id(self, account_id: str, tx_id: str) -> Transaction: ...
+
+    async def spending(self, account_id: str, start: date, end: date) -> Union[List[Transaction], SpendBreakdown]: ...
+
+    async def recurring(self, account_id: str, start: date, end: date) -> Union[List[Transaction], RecurringWindow]: ...
+
+
+class HttpToolBackend:
+    """
+    Calls the /tool API over HTTP; for deployments where the store runs in
+    another service. Row and single-transaction reads go through a
+    ConditionalCache, so repeat reads of unchanged data come back as 304s.
+    """
+
+    def __init__(self, base_url: str = TOOL_BASE_URL):
+        self.base_url = base_url
+        self.cache = ConditionalCache()
+
+    async def get_transactions(
+        self, account_id: str, start: date, end: date, limit: Optional[int] = None,
+    ) -> List[Transaction]:
+        """Newest `limit` rows (default page size when None); only those go over the wire."""
+        rows, _ = await self._page(account_id, start, end, _page_size(limit))
+        return rows
+
+    async def iter_transactions(
+        self, account_id: str, start: date, end: date, include_pending: bool = True, order: Order = "desc",
+    ) -> AsyncIterator[Transaction]:
+        """Every row in the range from the NDJSON stream, parsed line by line as it arrives."""
+        client = get_client("tools")
+        params = {
+            "accountId": account_id,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "includePending": include_pending,
+            "order": order,
+            "format": "ndjson",
+        }
+        async with client.stream(
+            "GET", f"{self.base_url}/tool/transactions", params=params, headers={"Accept": NDJSON_MEDIA_TYPE},
+        ) as r:
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if line:
+                    yield Transaction.model_validate_json(line)
+
+    async def get_all_transactions(self, account_id: str, start: date, end: date) -> List[Transaction]:
+        """Every row in the range, in one streamed request."""
+        return [tx async for tx in self.iter_transactions(account_id, start, end)]
+
+    async def _page(
+        self, account_id: str, start: date, end: date, limit: int, cursor: Optional[str] = None,
+    ) -> Tuple[List[Transaction], Optional[str]]:
+        client = get_client("tools")
+        params = {
+            "accountId": account_id,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "limit": limit,
+        }
+        if cursor:
+            params["cursor"] = cursor
+
+        def parse(r: httpx.Response) -> Tuple[List[Transaction], Optional[str]]:
+            return [Transaction.model_validate(x) for x in r.json()], r.headers.get(NEXT_CURSOR_HEADER)
+
+        rows, next_cursor = await self.cache.get(client, f"{self.base_url}/tool/transactions", params, parse)
+        return list(rows), next_cursor
+
+    async def get_transaction_by_id(self, account_id: str, tx_id: str) -> Transaction:
+        client = get_client("tools")
+        return await self.cache.get(
+            client,
+            f"{self.base_url}/tool/transactions/{tx_id}",
+            {"accountId": account_id},
+            lambda r: Transaction.model_validate(r.json()),
+        )
+
+    async def spending(self, account_id: str, start: date, end: date) -> List[Transaction]:
+        return await self.get_all_transactions(account_id, start, end)
+
+    async def recurring(self, account_id: str, start: date, end: date) -> List[Transaction]:
+        return await self.get_all_transactions(account_id, start, end)
+
+
+class InProcessToolBackend:
+    """
+    Reads mock_store directly: no loopback hop, no JSON round trip, and the
+    store's model objects are returned as-is without re-validation. Analytics
+    intents get the precomputed rollup / recurring state instead of raw rows.
+    Store calls run in a worker thread so a cold account load never blocks the event loop.
+    """
+
+    async def get_transactions(
+        self, account_id: str, start: date, end: date, limit: Optional[int] = None,
+    ) -> List[Transaction]:
+        return await asyncio.to_thread(mock_store.query_transactions, account_id, start, end, True, _page_size(limit))
+
+    async def iter_transactions(
+        self, account_id: str, start: date, end: date, include_pending: bool = True, order: Order = "desc",
+    ) -> AsyncIterator[Transaction]:
+        rows = await asyncio.to_thread(mock_store.iter_transactions, account_id, start, end, include_pending, order)
+        for i, tx in enumerate(rows, 1):
+            yield tx
+            if i % _YIELD_EVERY == 0:
+                await asyncio.sleep(0)  # long exports shouldn't hog the event loop
+
+    async def get_transaction_by_id(self, account_id: str, tx_id: str) -> Transaction:
+        tx = await asyncio.to_thread(mock_store.find_transaction, account_id, tx_id)
+        if not tx:
+            raise HTTPException(status_code=404, detail="Transaction not found")
+        return tx
+
+    async def spending(self, account_id: str, start: date, end: date) -> SpendBreakdown:
+        return await asyncio.to_thread(mock_store.spend_breakdown, account_id, start, end)
+
+    async def recurring(self, account_id: str, start: date, end: date) -> RecurringWindow:
+        return await asyncio.to_thread(mock_store.recurring_window, account_id, start, end)
+
+
+_BACKEND: Optional[ToolBackend] = None
+
+
+def get_tool_backend() -> ToolBackend:
+    """Backend selected by TOOL_BACKEND ("inprocess" or "http")."""
+    global _BACKEND
+    if _BACKEND is None:
+        if TOOL_BACKEND == "http":
+            _BACKEND = HttpToolBackend()
+        elif TOOL_BACKEND == "inprocess":
+            _BACKEND = InProcessToolBackend()
+        else:
+            raise ValueError(f"Unknown TOOL_BACKEND: {TOOL_BACKEND!r} (expected 'inprocess' or 'http')")
+    return _BACKEND
+
+
+def tool_cache_stats() -> Optional[Dict[str, Any]]:
+    """Client-side response cache counters when the HTTP backend is in use."""
+    backend = _BACKEND
+    return backend.cache.stats() if isinstance(backend, HttpToolBackend) else None
+
+
+def set_tool_backend(backend: Optional[ToolBackend]) -> None:
+    """Override the configured backend (None resets to TOOL_BACKEND)."""
+    global _BACKEND
+    _BACKEND = backend
@@ -1,51 +1,261 @@
 # from __future__ import annotations
 
-from datetime import date
-from fastapi import APIRouter, HTTPException, Query
+import asyncio
+import base64
+import errno
+import hashlib
+import json
+from datetime import date, datetime
+from itertools import islice
+from typing import AsyncIterator, Dict, Iterator, List, Literal, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
-from src.schemas import Transaction
-from src.mock_store import find_transaction, get_transactions
+from src.config import TOOL_BATCH_MAX_CONCURRENCY, TOOL_CACHE_MAX_AGE_SECONDS
+from src.serialize import RawJSONResponse, json_array, transaction_json
+from src.schemas import (
+    Transaction,
+    TransactionBatchRequest,
+    TransactionBatchResult,
+    TransactionIngestRequest,
+    TransactionIngestResult,
+    TransactionQuery,
+)
+from src.mock_store import (
+    Order,
+    account_version,
+    SortKey,
+    find_transaction,
+    get_account_index,
+    ingest_transactions,
+    iter_transactions,
+    sort_key,
+)
 router = APIRouter(prefix="/tool", tags=["tool-api"])   
 
+# Response header carrying the cursor for the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+DEFAULT_LIMIT = 500
+# Rows per chunk handed to the server; Starlette runs each step of a sync iterator in a worker thread
+NDJSON_CHUNK_ROWS = 256
+
+def encode_cursor(tx: Transaction) -> str:
+    """Opaque keyset cursor: the (postedAt, id) of the last row of a page; its sort key follows from them."""
+    _, posted_at, tx_id = sort_key(tx)
+    raw = json.dumps([posted_at.isoformat(), tx_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> SortKey:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        posted_at, tx_id = json.loads(raw)
+        posted_at = datetime.fromisoformat(posted_at)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+    if posted_at.tzinfo is None:
+        # Rows carry UTC offsets; a naive timestamp can't be ordered against them
+        raise HTTPException(status_code=400, detail="Invalid cursor: timestamp has no UTC offset")
+    # postedAt keeps its offset, so .date() is the row's local date: the sort key's first part
+    return posted_at.date(), posted_at, str(tx_id)
+
+CACHE_CONTROL = f"private, max-age={TOOL_CACHE_MAX_AGE_SECONDS}, must-revalidate"
+
+def make_etag(account_id: str, *params: object) -> str:
+    """
+    Strong ETag for a response that is a pure function of the account's data
+    version and the request params. Taken before the data is read, so a
+    concurrent file change can only make the tag older than the body, never newer.
+    """
+    raw = repr((account_version(account_id), account_id, params)).encode()
+    return '"' + hashlib.sha1(raw).hexdigest()[:24] + '"'
+
+def _not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 for a matching If-None-Match, else None."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    if "*" in tags or etag in tags:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    return None
+
+def _ndjson_chunks(rows: Iterator[Transaction]) -> Iterator[bytes]:
+    while True:
+        chunk = list(islice(rows, NDJSON_CHUNK_ROWS))
+        if not chunk:
+            return
+        # Not the index's cached fragments: an export of the whole account would cache all of it
+        yield b"".join(transaction_json(tx) + b"\n" for tx in chunk)
+
 @router.get("/transactions", response_model=list[Transaction])
 @router.get("/transactions")
 def list_transactions(
+    request: Request,
     accountId: str = Query(..., description="Bank account id"),
     start: date = Query(..., description="YYYY-MM-DD inclusive"),
     end: date = Query(..., description="YYYY-MM-DD inclusive"),
     includePending: bool = Query(True, description="Include pending transactions"),
-    limit: int = Query(500, ge=1, le=5000),
+    limit: Optional[int] = Query(None, ge=1, le=5000, description=f"Default {DEFAULT_LIMIT}; NDJSON streams the whole range when omitted"),
+    order: Order = Query("desc", description="desc = newest first, asc = oldest first"),
+    cursor: Optional[str] = Query(None, description=f"Resume after a previous page ({NEXT_CURSOR_HEADER} header)"),
+    format: Optional[Literal["json", "ndjson"]] = Query(None, description=f"ndjson (or Accept: {NDJSON_MEDIA_TYPE}) streams one transaction per line"),
 ):
     """
     Sequence:
     1) Validate accountId is non-empty.
-    2) Load all transactions for accountId from JSON via mock_store.get_transactions(accountId).
-    3) Filter to date range (inclusive):
+    2) Look up the account's date index via mock_store.get_account_index(...).
+    3) Bisect to the date range (inclusive):
        - tx.postedAt.date() >= start AND tx.postedAt.date() <= end
-    4) Filter out pending if includePending is False.
-    5) Sort by postedAt.
-    6) Apply limit.
-    7) Return list[Transaction].
+       and, with a cursor, to the rows strictly past its (date, postedAt, id) sort key in `order`.
+    4) Walk the range in `order`, skipping pending if includePending is False.
+    5) Stop once limit rows are collected (no per-request sort).
+    6) Return list[Transaction]; if more rows follow, the cursor for the
+       next page is in the X-Next-Cursor header. The body is joined from
+       the index's cached per-row JSON and sent as-is: the rows come from
+       the store, so there is no response_model pass over them.
+
+    Responses carry an ETag (data version + params) and Cache-Control; a
+    matching If-None-Match gets 304 before any rows are read.
+
+    NDJSON mode streams the rows as they are walked instead, one JSON object
+    per line, in chunks; nothing is collected first. There is no cursor
+    header (it would have to be known before the body). To resume an
+    interrupted export, pass the cursor of the last row received
+    (encode_cursor of that row).
     """
     if not accountId:
         raise HTTPException(status_code=400, detail="accountId is required")
-    all_txs = get_transactions(accountId)
-    # Filter by date range
-    filtered_txs = [
-        tx for tx in all_txs
-        if start <= tx.postedAt.date() <= end
-    ]
-    # Filter out pending if needed
-    if not includePending:
-        filtered_txs = [tx for tx in filtered_txs if not tx.isPending]
-    # Sort newest first
-    sorted_txs = sorted(filtered_txs, key=lambda tx: tx.postedAt, reverse=True)
-    # Apply limit
-    limited_txs = sorted_txs[:limit]
-    return limited_txs
+    after = decode_cursor(cursor) if cursor else None
+    ndjson = format == "ndjson" or (format is None and NDJSON_MEDIA_TYPE in request.headers.get("accept", ""))
+    etag = make_etag(accountId, start, end, includePending, limit, order, cursor, ndjson)
+    not_modified = _not_modified(request, etag)
+    if not_modified is not None:
+        return not_modified
+    cache_headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if ndjson:
+        rows_iter = iter_transactions(accountId, start, end, include_pending=includePending, order=order, after=after)
+        if limit is not None:
+            rows_iter = islice(rows_iter, limit)
+        return StreamingResponse(_ndjson_chunks(rows_iter), media_type=NDJSON_MEDIA_TYPE, headers=cache_headers)
+    index = get_account_index(accountId)
+    rows, has_more = index.page(
+        start, end, includePending, limit if limit is not None else DEFAULT_LIMIT, order, after,
+    )
+    if has_more:
+        cache_headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1])
+    return RawJSONResponse(json_array(index.json_fragments(rows)), headers=cache_headers)
+
+def _run_account_queries(account_id: str, items: List[Tuple[int, TransactionQuery]]) -> List[TransactionBatchResult]:
+    """All of one account's batch queries against a single load of its index."""
+    def failed(i: int, status: int, detail: str) -> TransactionBatchResult:
+        return TransactionBatchResult(index=i, accountId=account_id, status=status, error=detail)
+
+    if not account_id:
+        return [failed(i, 400, "accountId is required") for i, _ in items]
+    try:
+        index = get_account_index(account_id)
+    except Exception as e:
+        return [failed(i, 500, f"Failed to load account: {e}") for i, _ in items]
+    out: List[TransactionBatchResult] = []
+    for i, q in items:
+        try:
+            after = decode_cursor(q.cursor) if q.cursor else None
+            rows, has_more = index.page(q.start, q.end, q.includePending, q.limit, q.order, after)
+        except HTTPException as e:
+            out.append(failed(i, e.status_code, str(e.detail)))
+            continue
+        except Exception as e:
+            # One bad query must not take the rest of the batch (or its stream) down with it
+            out.append(failed(i, 500, f"Query failed: {e}"))
+            continue
+        out.append(TransactionBatchResult(
+            index=i,
+            accountId=account_id,
+            transactions=rows,
+            nextCursor=encode_cursor(rows[-1]) if has_more else None,
+        ))
+    return out
+
+@router.post("/transactions:batch")
+async def batch_transactions(
+    body: TransactionBatchRequest,
+    format: Optional[Literal["json", "ndjson"]] = Query(None, description="ndjson (default) streams results as they finish; json returns them all in request order"),
+):
+    """
+    Sequence:
+    1) Group the queries by accountId, so each account is loaded once no
+       matter how many of its queries are in the batch.
+    2) Run the groups concurrently (at most TOOL_BATCH_MAX_CONCURRENCY at
+       a time), each in a worker thread against the store.
+    3) Report every query as a TransactionBatchResult with its request
+       index; failures (bad cursor, unreadable account) are per-item
+       status/error and never fail the batch.
+    4) NDJSON: stream each account's results as soon as it is done.
+       JSON: {"results": [...]} in request order once all are done.
+    """
+    groups: Dict[str, List[Tuple[int, TransactionQuery]]] = {}
+    for i, q in enumerate(body.queries):
+        groups.setdefault(q.accountId, []).append((i, q))
+
+    sem = asyncio.Semaphore(TOOL_BATCH_MAX_CONCURRENCY)
+
+    async def run(account_id: str, items: List[Tuple[int, TransactionQuery]]) -> List[TransactionBatchResult]:
+        async with sem:
+            return await asyncio.to_thread(_run_account_queries, account_id, items)
+
+    tasks = [asyncio.ensure_future(run(account_id, items)) for account_id, items in groups.items()]
+
+    if format == "json":
+        results = [r for group in await asyncio.gather(*tasks) for r in group]
+        results.sort(key=lambda r: r.index)
+        return {"results": results}
+
+    async def lines() -> AsyncIterator[bytes]:
+        try:
+            for done in asyncio.as_completed(tasks):
+                group = await done
+                yield b"".join(r.model_dump_json().encode() + b"\n" for r in group)
+        finally:
+            # Client went away mid-stream: don't start groups nobody will read
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
+@router.post("/transactions:ingest", response_model=TransactionIngestResult)
+def ingest(body: TransactionIngestRequest):
+    """
+    Sequence:
+    1) Validate every transaction belongs to body.accountId (400 if not).
+    2) mock_store.ingest_transactions appends them to the account's
+       write-ahead log (fsynced) and upserts them by id into the loaded
+       index: date index, id index, spend rollup and recurring state are
+       updated in place, no reload.
+    3) Other workers pick the records up from the log on their next read;
+       the account's ETags change with the log.
+    4) Return how many ids were new vs. new versions of existing ones.
+
+    The data directory must be writable: 507 when its disk is full, 503
+    for any other write failure (e.g. a read-only mount). Nothing is
+    applied unless the log append succeeded.
+    """
+    try:
+        counts = ingest_transactions(body.accountId, body.transactions)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except OSError as e:
+        print(f"[WAL] {body.accountId}: ingest failed: {e}")
+        if e.errno in (errno.ENOSPC, errno.EDQUOT):
+            raise HTTPException(status_code=507, detail="No space left to log the transactions") from e
+        raise HTTPException(status_code=503, detail=f"Can't write the transaction log: {e.strerror or e}") from e
+    return TransactionIngestResult(accountId=body.accountId, **counts)
 
 @router.get("/transactions/{txId}", response_model=Transaction)
 def get_transaction_by_id(
+    request: Request,
+    response: Response,
     txId: str,
     accountId: str = Query(..., description="Bank account id"),
 ):
@@ -54,12 +264,18 @@ def get_transaction_by_id(
     1) Validate accountId and txId are non-empty.
     2) Load transaction via mock_store.find_transaction(accountId, txId).
     3) If not found, raise HTTP 404.
-    4) Return Transaction (Pydantic model or dict).
+    4) Return Transaction (Pydantic model or dict), with ETag / Cache-Control
+       (304 on a matching If-None-Match).
     """
 
     if not accountId or not txId:
         raise HTTPException(status_code=400, detail="accountId and txId are required")
+    etag = make_etag(accountId, txId)
+    not_modified = _not_modified(request, etag)
+    if not_modified is not None:
+        return not_modified
     tx = find_transaction(accountId, txId)
     if not tx:
         raise HTTPException(status_code=404, detail="Transaction not found")
+    response.headers.update({"ETag": etag, "Cache-Control": CACHE_CONTROL})
     return tx
\ No newline at end of file
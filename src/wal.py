@@ -0,0 +1,104 @@
+"""
+Per-account write-ahead log of ingested transactions: data/txns_X.wal next
+to data/txns_X.json, one Transaction JSON object per line, each an upsert
+by id (a new transaction, or a new version of one, e.g. pending -> posted).
+
+Appends and compaction hold an exclusive flock on data/txns_X.wal.lock, so
+any number of worker processes can ingest into the same account. Readers
+take no lock: they remember (inode, offset) and consume only complete
+lines past it. Compaction swaps in a fresh, empty log (new inode) rather
+than truncating, which is how readers notice it.
+"""
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from .config import WAL_FSYNC
+
+SUFFIX = ".wal"
+
+# (inode, size) of a log file; (0, 0) when there is none
+WalVersion = Tuple[int, int]
+NO_WAL: WalVersion = (0, 0)
+
+
+def wal_path(json_path: Path) -> Path:
+    return json_path.with_suffix(SUFFIX)
+
+
+def version(path: Path) -> WalVersion:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return NO_WAL
+    return (st.st_ino, st.st_size)
+
+
+@contextmanager
+def locked(path: Path) -> Iterator[None]:
+    """Exclusive, cross-process lock on the log for appending or compacting."""
+    with open(path.with_name(path.name + ".lock"), "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def append(path: Path, records: Sequence[Dict[str, Any]]) -> Tuple[int, int, int]:
+    """
+    Append records in a single write; returns (inode, start, end) offsets.
+    The caller holds locked(path).
+    """
+    data = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records).encode()
+    with open(path, "a+b") as f:
+        start = _drop_torn_tail(f)
+        f.write(data)
+        f.flush()
+        if WAL_FSYNC:
+            os.fsync(f.fileno())
+        return os.fstat(f.fileno()).st_ino, start, start + len(data)
+
+
+def read(path: Path, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+    """Complete records after `offset`, and the offset just past the last of them."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], offset
+    end = data.rfind(b"\n") + 1
+    return [json.loads(line) for line in data[:end].splitlines() if line.strip()], offset + end
+
+
+def reset(path: Path) -> None:
+    """Replace the log with an empty one. The caller holds locked(path)."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(b"")
+    tmp.replace(path)
+
+
+def _drop_torn_tail(f) -> int:
+    # A writer that died mid-append leaves a partial last line; cut it so the next record starts clean
+    size = f.seek(0, os.SEEK_END)
+    pos = size
+    while pos > 0:
+        step = min(4096, pos)
+        f.seek(pos - step)
+        chunk = f.read(step)
+        i = chunk.rfind(b"\n")
+        if i >= 0:
+            pos = pos - step + i + 1
+            break
+        pos -= step
+    if pos != size:
+        print(f"[WAL] Dropping {size - pos} bytes of a torn record at the end of {f.name}")
+        f.truncate(pos)
+    f.seek(pos)
+    return pos
@@ -6,6 +6,14 @@
 
 BASE_URL="${1:-http://localhost:8000}"
 ENDPOINT="${BASE_URL}/chat"
+TOOL_URL="${BASE_URL}/tool"
+HEADERS_FILE=$(mktemp)
+# The ingest checks write to an account of their own, new on every run; its files
+# (txns_<id>.json, .wal, .wal.lock, ...) are removed from the service's data directory
+# on exit. Set DATA_DIR when that isn't this checkout's data/ (e.g. mounted elsewhere)
+DATA_DIR="${DATA_DIR:-$(cd "$(dirname "$0")/.." && pwd)/data}"
+INGEST_ACCOUNT="TEST_INGEST_$(date +%s)_$$"
+trap 'rm -f "$HEADERS_FILE" "$DATA_DIR/txns_$INGEST_ACCOUNT".*' EXIT
 
 PASS_COUNT=0
 FAIL_COUNT=0
@@ -94,6 +102,34 @@ except Exception as e:
     ((PASS_COUNT++))
 }
 
+# Tool API check: pipe a response into a python3 snippet that exits non-zero on failure
+test_tool() {
+    local test_name="$1"
+    local response="$2"
+    local check="$3"
+
+    echo "TEST: $test_name"
+    if result=$(echo "$response" | python3 -c "$check" 2>&1); then
+        [ -n "$result" ] && echo "$result"
+        echo "✅ PASSED"
+        ((PASS_COUNT++))
+    else
+        echo "❌ FAILED - $result"
+        ((FAIL_COUNT++))
+    fi
+    echo ""
+}
+
+# Transaction ids of a JSON list (or NDJSON lines) on stdin, one per line
+ids_of() {
+    python3 -c "
+import sys, json
+text = sys.stdin.read().strip()
+rows = json.loads(text) if text.startswith('[') else [json.loads(l) for l in text.splitlines() if l]
+print('\n'.join(t['id'] for t in rows))
+"
+}
+
 # 1. COUNT-BASED QUERIES
 echo "=========================================="
 echo "1. COUNT-BASED QUERIES"
@@ -176,6 +212,116 @@ test_query "YTD" "transactions ytd" "top_spending_ytd" "Total spending"
 test_query "Last 7 days" "last 7 days" "transactions_list" ""
 test_query "Recent transactions" "recent transactions" "transactions_list" ""
 
+# 8. TOOL API
+echo "=========================================="
+echo "8. TOOL API"
+echo "=========================================="
+RANGE="accountId=A123&start=2000-01-01&end=2100-01-01"
+
+# Startup pre-warming finishes in the background; /ready turns 200 when it has
+for i in $(seq 1 30); do
+    ready_code=$(curl -s -o /dev/null -w "%{http_code}" "$BASE_URL/ready")
+    [ "$ready_code" = "200" ] && break
+    sleep 1
+done
+test_tool "Readiness" "$(curl -s "$BASE_URL/ready")" "
+import sys, json
+d = json.load(sys.stdin)
+assert d['ready'] is True, d
+print('Pre-warm:', d['counts'])
+"
+
+for order in desc asc; do
+    full=$(curl -s "$TOOL_URL/transactions?$RANGE&limit=5000&order=$order" | ids_of)
+    paged=""
+    cursor=""
+    for i in $(seq 1 500); do
+        page=$(curl -s -D "$HEADERS_FILE" "$TOOL_URL/transactions?$RANGE&limit=7&order=$order${cursor:+&cursor=$cursor}")
+        paged="$paged$(echo "$page" | ids_of)"$'\n'
+        cursor=$(grep -i '^x-next-cursor:' "$HEADERS_FILE" | cut -d' ' -f2 | tr -d '\r')
+        [ -z "$cursor" ] && break
+    done
+    test_tool "Cursor paging ($order) equals the unpaged list" "$(printf '%s\n===\n%s' "$full" "$paged")" "
+import sys
+full, paged = sys.stdin.read().split('===')
+full, paged = full.split(), paged.split()
+assert full and paged == full, (len(paged), len(full))
+print('Rows:', len(full))
+"
+done
+
+test_tool "order=asc is order=desc reversed" "$(curl -s "$TOOL_URL/transactions?$RANGE&limit=5000&order=asc" | ids_of; echo ===; curl -s "$TOOL_URL/transactions?$RANGE&limit=5000" | ids_of)" "
+import sys
+asc, desc = (part.split() for part in sys.stdin.read().split('==='))
+assert asc == desc[::-1], 'orders differ'
+"
+
+test_tool "format=ndjson streams the same rows" "$(curl -s "$TOOL_URL/transactions?$RANGE&format=ndjson" | ids_of; echo ===; curl -s "$TOOL_URL/transactions?$RANGE&limit=5000" | ids_of)" "
+import sys
+ndjson, listed = (part.split() for part in sys.stdin.read().split('==='))
+assert ndjson and ndjson == listed, (len(ndjson), len(listed))
+"
+
+test_tool "Invalid cursor is a 400" "$(curl -s -o /dev/null -w "%{http_code}" "$TOOL_URL/transactions?$RANGE&cursor=not-a-cursor")" "
+import sys
+code = sys.stdin.read().strip()
+assert code == '400', code
+"
+
+curl -s -o /dev/null -D "$HEADERS_FILE" "$TOOL_URL/transactions?$RANGE&limit=5"
+etag=$(grep -i '^etag:' "$HEADERS_FILE" | cut -d' ' -f2 | tr -d '\r')
+test_tool "If-None-Match revalidates with 304" "$(curl -s -o /dev/null -w "%{http_code}" -H "If-None-Match: $etag" "$TOOL_URL/transactions?$RANGE&limit=5")" "
+import sys
+code = sys.stdin.read().strip()
+assert code == '304', code
+"
+
+batch_body='{"queries":[{"accountId":"A123","start":"2000-01-01","end":"2100-01-01","limit":5},{"accountId":"A123","start":"2000-01-01","end":"2100-01-01","limit":5,"cursor":"not-a-cursor"}]}'
+test_tool "Batch (json) with a per-item failure" "$(curl -s -X POST "$TOOL_URL/transactions:batch?format=json" -H "Content-Type: application/json" -d "$batch_body"; echo; curl -s "$TOOL_URL/transactions?$RANGE&limit=5")" "
+import sys, json
+batch, single = sys.stdin.read().split('\n', 1)
+results = json.loads(batch)['results']
+assert [r['status'] for r in results] == [200, 400], results
+assert [t['id'] for t in results[0]['transactions']] == [t['id'] for t in json.loads(single)]
+"
+
+test_tool "Batch (ndjson) streams every query" "$(curl -s -X POST "$TOOL_URL/transactions:batch" -H "Content-Type: application/json" -d "$batch_body")" "
+import sys, json
+lines = [json.loads(l) for l in sys.stdin.read().splitlines() if l]
+assert sorted(r['index'] for r in lines) == [0, 1], lines
+"
+
+# Ingest writes to $INGEST_ACCOUNT (removed on exit), leaving A123 as it is
+TX_ID="test-$(date +%s)-$$"
+ingest_tx() {
+    echo "{\"accountId\":\"$INGEST_ACCOUNT\",\"transactions\":[{\"id\":\"$TX_ID\",\"accountId\":\"$INGEST_ACCOUNT\",\"postedAt\":\"2025-06-01T12:00:00Z\",\"direction\":\"debit\",\"amount\":$1,\"merchant\":{\"name\":\"Test Shop\",\"category\":\"Shopping\",\"subcategory\":\"General\"},\"isPending\":$2}]}"
+}
+test_tool "Ingest a new transaction" "$(curl -s -X POST "$TOOL_URL/transactions:ingest" -H "Content-Type: application/json" -d "$(ingest_tx 12.34 true)")" "
+import sys, json
+d = json.load(sys.stdin)
+assert d == {'accountId': '$INGEST_ACCOUNT', 'inserted': 1, 'updated': 0}, d
+"
+test_tool "Read the ingested transaction" "$(curl -s "$TOOL_URL/transactions/$TX_ID?accountId=$INGEST_ACCOUNT")" "
+import sys, json
+d = json.load(sys.stdin)
+assert d['amount'] == 12.34 and d['isPending'] is True, d
+"
+test_tool "Ingest a new version (pending -> posted)" "$(curl -s -X POST "$TOOL_URL/transactions:ingest" -H "Content-Type: application/json" -d "$(ingest_tx 15.00 false)")" "
+import sys, json
+d = json.load(sys.stdin)
+assert d == {'accountId': '$INGEST_ACCOUNT', 'inserted': 0, 'updated': 1}, d
+"
+test_tool "List shows the new version once" "$(curl -s "$TOOL_URL/transactions?accountId=$INGEST_ACCOUNT&start=2025-06-01&end=2025-06-01&limit=5000")" "
+import sys, json
+rows = [t for t in json.load(sys.stdin) if t['id'] == '$TX_ID']
+assert len(rows) == 1 and rows[0]['amount'] == 15.0 and rows[0]['isPending'] is False, rows
+"
+test_tool "Ingest for another account is a 400" "$(curl -s -o /dev/null -w "%{http_code}" -X POST "$TOOL_URL/transactions:ingest" -H "Content-Type: application/json" -d "$(ingest_tx 1 false | sed "s/\"accountId\":\"$INGEST_ACCOUNT\",\"transactions\"/\"accountId\":\"A123\",\"transactions\"/")")" "
+import sys
+code = sys.stdin.read().strip()
+assert code == '400', code
+"
+
 echo "============================================"
 echo "Test Suite Complete"
 echo "============================================"